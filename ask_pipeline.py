@@ -0,0 +1,249 @@
+"""
+ask_pipeline.py
+
+Async /ask pipeline:
+
+    slot-filling ──► prediction ──┐
+                 └─► error logs ──┴─► prompt ──► LLM ──► save chat
+
+Range questions (intent "risk_trend": "how has LH-003's risk changed over
+the last 90 days?") replace the prediction and error-log stages with one
+prediction_service.risk_history call: one feature query, one model call.
+
+Slot-filling tries the local rule-based parser (slot_parser) first and only
+calls DeepSeek when it is not confident.  Prediction and the error-log
+summary run concurrently once the slots are known.  Every stage has its own
+deadline (ASK_*_TIMEOUT, seconds), so a slow dependency fails that chat
+quickly instead of holding a thread.
+Blocking work (model, DB) runs in the default thread pool; OpenRouter calls
+go through the shared HTTP/2 client in openrouter_client.
+
+stream_ask is the same pipeline as Server-Sent Events: the prediction and
+SHAP explanations go out as the first event, then the answer token by
+token, and the chat row is queued once the stream has completed.
+Chats are persisted write-behind (chat_writer), so no response waits on
+the INSERT; CHAT_WRITE_BEHIND=0 restores the synchronous write.
+
+Every stage is a telemetry span (wtg_stage_seconds); pass a `timings` dict
+to also collect per-stage wall time in ms (app.py turns it into a
+Server-Timing header).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator, Optional
+
+import chat_writer
+import prediction_service
+import slot_parser
+import telemetry
+from ask_turbine_bot import parse_with_deepseek_async
+from db import SessionLocal
+from deepseek_client import query_deepseek_async, stream_deepseek_async
+from get_errors_logs_summary import get_error_summary_for
+from models import ChatMessage
+from prompt_generator import format_risk_trend, generate_deepseek_prompt, generate_trend_prompt
+from shap_formatter import prepare_shap_for_prompt
+from telemetry import span
+
+log = logging.getLogger("wtg.ask")
+
+PARSE_TIMEOUT   = float(os.getenv("ASK_PARSE_TIMEOUT", "20"))
+PREDICT_TIMEOUT = float(os.getenv("ASK_PREDICT_TIMEOUT", "5"))
+ERRORS_TIMEOUT  = float(os.getenv("ASK_ERRORS_TIMEOUT", "3"))
+LLM_TIMEOUT     = float(os.getenv("ASK_LLM_TIMEOUT", "60"))
+SAVE_TIMEOUT    = float(os.getenv("ASK_SAVE_TIMEOUT", "5"))
+
+ERRORS_UNAVAILABLE = "Error logs could not be retrieved for this date."
+
+
+class StageTimeout(RuntimeError):
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"'{stage}' stage exceeded its {timeout:g}s deadline")
+        self.stage = stage
+
+
+async def run_stage(stage: str, awaitable, timeout: float, timings: Optional[dict] = None):
+    t0 = time.perf_counter()
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise StageTimeout(stage, timeout)
+    finally:
+        telemetry.record(stage, time.perf_counter() - t0, timings)
+
+
+async def _error_summary(turbine_id: str, log_date: str, timings: Optional[dict] = None) -> str:
+    # Error logs only add context to the answer, so degrade instead of failing
+    try:
+        return await run_stage(
+            "error_logs",
+            asyncio.to_thread(get_error_summary_for, turbine_id, log_date),
+            ERRORS_TIMEOUT,
+            timings,
+        )
+    except Exception as e:
+        log.warning("⚠️ Error-log summary unavailable: %s", e)
+        return ERRORS_UNAVAILABLE
+
+
+def save_chat(user_id: Optional[int], question: str, answer: str, intent: str):
+    db = SessionLocal()
+    try:
+        db.add(ChatMessage(
+            user_id=user_id,
+            user_message=question,
+            bot_response=answer,
+            intent=intent
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def persist_chat(user_id: Optional[int], question: str, answer: str, intent: str,
+                       timings: Optional[dict] = None):
+    # A lost chat row must never fail the answer itself
+    try:
+        if chat_writer.CHAT_WRITE_BEHIND:
+            with span("save_chat", timings):
+                chat_writer.get_writer().submit(user_id, question, answer, intent)
+        else:
+            await run_stage("save_chat", asyncio.to_thread(save_chat, user_id, question, answer, intent),
+                            SAVE_TIMEOUT, timings)
+    except Exception as e:
+        log.warning("❌ Error while saving chat: %s", e)
+
+
+async def parse_question(question: str, timings: Optional[dict] = None) -> dict:
+    # Local rules first; only low-confidence questions pay for an LLM call
+    with span("slot_rules", timings):
+        parsed = await asyncio.to_thread(slot_parser.parse_slots, question)
+    if parsed is not None:
+        return parsed
+
+    t0 = time.perf_counter()
+    parsed = await run_stage("slot_filling", parse_with_deepseek_async(question), PARSE_TIMEOUT, timings)
+    slot_parser.stats.record_fallback(time.perf_counter() - t0)
+    return parsed
+
+
+TREND_ROLLING_DAYS = [7]
+
+
+async def trend_context(question: str, parsed: dict, timings: Optional[dict] = None) -> dict:
+    days = parsed.get("days")
+    history = await run_stage(
+        "prediction",
+        asyncio.to_thread(prediction_service.risk_history, parsed["turbine_id"],
+                          parsed.get("start_date"), parsed.get("end_date"),
+                          int(days) if days else None, 3, TREND_ROLLING_DAYS),
+        PREDICT_TIMEOUT,
+        timings,
+    )
+    with span("prompt", timings):
+        prompt = generate_trend_prompt(question, format_risk_trend(history),
+                                       prepare_shap_for_prompt(history["explanations"]))
+    return {
+        "parsed": parsed,
+        # Same shape as a single-day prediction (latest day), plus the period
+        "prediction": {
+            "turbine_id": history["turbine_id"],
+            "log_date": history["end_date"],
+            "fault_probability": history["summary"]["last"],
+            "explanations": history["explanations"],
+            "model_version": history["model_version"],
+            "start_date": history["start_date"],
+            "summary": history["summary"],
+        },
+        "prompt": prompt,
+        "cache_tag": f"{history['turbine_id']}:{history['start_date']}..{history['end_date']}",
+    }
+
+
+async def gather_context(question: str, timings: Optional[dict] = None) -> dict:
+    """
+    Slot-filling, prediction and error logs → everything the LLM prompt needs.
+    """
+    parsed = await parse_question(question, timings)
+    if parsed.get("intent") == "risk_trend":
+        return await trend_context(question, parsed, timings)
+    turbine_id = parsed["turbine_id"]
+    log_date = parsed.get("log_date")
+
+    predict = run_stage(
+        "prediction",
+        asyncio.to_thread(prediction_service.predict_fault_for, turbine_id, log_date),
+        PREDICT_TIMEOUT,
+        timings,
+    )
+    if log_date:
+        model_response, error_summary = await asyncio.gather(
+            predict, _error_summary(turbine_id, log_date, timings)
+        )
+    else:
+        # "Latest" date is only known once the feature row has been resolved
+        model_response = await predict
+        error_summary = await _error_summary(turbine_id, model_response["log_date"], timings)
+
+    with span("prompt", timings):
+        shap_text = prepare_shap_for_prompt(model_response["explanations"])
+        prompt = generate_deepseek_prompt(question, shap_text, error_summary)
+    return {
+        "parsed": parsed,
+        "prediction": model_response,
+        "prompt": prompt,
+        # LLM cache tag, so answers can be invalidated per turbine/date
+        "cache_tag": f"{model_response['turbine_id']}:{model_response['log_date']}",
+    }
+
+
+async def run_ask(question: str, user_id: Optional[int] = None,
+                  timings: Optional[dict] = None) -> dict:
+    ctx = await gather_context(question, timings)
+
+    answer = await run_stage(
+        "llm", query_deepseek_async(ctx["prompt"], timeout=LLM_TIMEOUT, cache_tag=ctx["cache_tag"]),
+        LLM_TIMEOUT, timings
+    )
+
+    await persist_chat(user_id, question, answer, ctx["parsed"].get("intent", "unknown"), timings)
+    return {"answer": answer, "explanations": ctx["prediction"]["explanations"]}
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_ask(question: str, user_id: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    Events: "explanations" (prediction + top features), "token" (answer
+    text delta, repeated), "done" (full answer + stage timings), or "error".
+    """
+    timings = {}
+    try:
+        ctx = await gather_context(question, timings)
+        yield sse_event("explanations", ctx["prediction"])
+
+        parts = []
+        t0 = time.perf_counter()
+        deadline = time.monotonic() + LLM_TIMEOUT
+        async for delta in stream_deepseek_async(ctx["prompt"], timeout=LLM_TIMEOUT,
+                                                 cache_tag=ctx["cache_tag"]):
+            parts.append(delta)
+            yield sse_event("token", {"text": delta})
+            if time.monotonic() > deadline:
+                raise StageTimeout("llm", LLM_TIMEOUT)
+        answer = "".join(parts)
+        telemetry.record("llm", time.perf_counter() - t0, timings)
+    except Exception as e:
+        log.warning("Error in /ask/stream: %s", e)
+        yield sse_event("error", {"detail": f"⚠️ Unable to process your request due to: {str(e)}"})
+        return
+
+    # Saved (or queued) before "done": a client that closes on "done" would
+    # otherwise cancel the generator before the chat row is written
+    await persist_chat(user_id, question, answer, ctx["parsed"].get("intent", "unknown"), timings)
+    yield sse_event("done", {"answer": answer, "timings": timings})
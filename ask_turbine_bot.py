@@ -4,38 +4,50 @@ ask_turbine_bot.py
 
 End-to-end:
   • Slot-fill with OpenRouter DeepSeek (with retries + longer timeout)
-  • Call local FastAPI /predict_fault
+  • Predict in-process via prediction_service
+    (or, with --http, call a running FastAPI /predict_fault)
   • Print out the result
 """
 import os
 import certifi
 import json
+import logging
 import requests
 import re
+from datetime import date
 from requests.adapters import HTTPAdapter, Retry
 from requests.exceptions import HTTPError, ConnectionError
 
 from shap_formatter import prepare_shap_for_prompt
 from get_errors_logs_summary import get_error_summary_for
-from prompt_generator import generate_deepseek_prompt
+from prompt_generator import format_risk_trend, generate_deepseek_prompt, generate_trend_prompt
 from deepseek_client import query_deepseek
+from openrouter_client import OPENROUTER_URL, DEEPSEEK_MODEL, chat_completion
+from llm_cache import cache
+from telemetry import sampled
 
 # ─── SSL CERT FIX (must come before any network calls) ─────────────────────────
 os.environ["SSL_CERT_FILE"]      = certifi.where()
 os.environ["REQUESTS_CA_BUNDLE"] = certifi.where()
 
 # ─── CONFIG ────────────────────────────────────────────────────────────────────
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not OPENROUTER_API_KEY:
-    raise RuntimeError(
-        "🔑 Please set OPENROUTER_API_KEY in your environment before running.\n"
-        "   In PowerShell: $Env:OPENROUTER_API_KEY = 'sk-...'\n"
-        "   In CMD:       set OPENROUTER_API_KEY=sk-..."
-    )
+def get_api_key() -> str:
+    # Checked when a call needs it, so importing this module never fails
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        raise RuntimeError(
+            "🔑 Please set OPENROUTER_API_KEY in your environment before running.\n"
+            "   In PowerShell: $Env:OPENROUTER_API_KEY = 'sk-...'\n"
+            "   In CMD:       set OPENROUTER_API_KEY=sk-..."
+        )
+    return api_key
+
+log = logging.getLogger("wtg.slots")
 
-DEEPSEEK_URL     = "https://openrouter.ai/api/v1/chat/completions"
-DEEPSEEK_MODEL   = "deepseek/deepseek-chat"
-LOCAL_PREDICT_URL = "http://localhost:8000/predict_fault"
+DEEPSEEK_URL     = OPENROUTER_URL
+LOCAL_PREDICT_URL = os.getenv("LOCAL_PREDICT_URL", "http://localhost:8000/predict_fault")
+LOCAL_API_URL = LOCAL_PREDICT_URL.rsplit("/", 1)[0]
+TREND_ROLLING_DAYS = [7]
 
 # ─── SESSION WITH RETRIES ──────────────────────────────────────────────────────
 session = requests.Session()
@@ -48,24 +60,63 @@ retries = Retry(
 adapter = HTTPAdapter(max_retries=retries)
 session.mount("https://", adapter)
 
+SLOT_FILLING_PROMPT = (
+    "You are a slot‐filling assistant. "
+    "Parse the user's question and return ONLY a JSON object "
+    "with keys: intent, turbine_id, and optionally log_date (ISO YYYY-MM-DD). "
+    "If the question is about a period or how the risk changed over time, use "
+    "intent \"risk_trend\" and instead of log_date give start_date and end_date "
+    "(ISO YYYY-MM-DD) for explicit dates, or days (an integer) for relative "
+    "windows such as \"the last 90 days\". "
+    "DO NOT wrap your JSON in markdown or add any commentary."
+)
+
+def _slot_filling_messages(user_query: str) -> list:
+    return [
+        {"role": "system",  "content": SLOT_FILLING_PROMPT},
+        {"role": "user",    "content": user_query},
+    ]
+
+def _parse_slot_reply(content: str) -> dict:
+    if sampled(log):
+        log.debug("📦 Raw DeepSeek response: %s", content)
+
+    # 2) strip markdown fences if present
+    #    it will remove json ... or ...
+
+    fence_match = re.match(r"^```(?:json)?\s*([\s\S]*?)\s*```$", content.strip())
+    if fence_match:
+        content = fence_match.group(1)
+
+    # 3) ensure non-empty
+    if not content.strip():
+        raise RuntimeError("DeepSeek reply was empty after stripping fences.")
+
+    # 4) parse JSON
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError as e:
+        raise RuntimeError(f"Invalid JSON from DeepSeek: {e}\n--- Raw content ---\n{content}")
+
+def _slot_cache_key(user_query: str) -> str:
+    # Relative dates ("yesterday") resolve differently each day, so the day is
+    # part of the key
+    return cache.make_key(DEEPSEEK_MODEL, _slot_filling_messages(user_query),
+                          extra=date.today().isoformat(), casefold=True)
+
 def parse_with_deepseek(user_query: str) -> dict:
+    key = _slot_cache_key(user_query) if cache else None
+    if key and (cached := cache.get(key)) is not None:
+        return _parse_slot_reply(cached)
+
     headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Authorization": f"Bearer {get_api_key()}",
         "Content-Type":  "application/json",
         "Accept":        "application/json",
     }
-    system_prompt = (
-        "You are a slot‐filling assistant. "
-        "Parse the user's question and return ONLY a JSON object "
-        "with keys: intent, turbine_id, and optionally log_date (ISO YYYY-MM-DD). "
-        "DO NOT wrap your JSON in markdown or add any commentary."
-    )
     payload = {
         "model": DEEPSEEK_MODEL,
-        "messages": [
-            {"role": "system",  "content": system_prompt},
-            {"role": "user",    "content": user_query},
-        ]
+        "messages": _slot_filling_messages(user_query)
     }
 
     resp = session.post(DEEPSEEK_URL, json=payload, headers=headers, timeout=30)
@@ -77,29 +128,31 @@ def parse_with_deepseek(user_query: str) -> dict:
         content = body["choices"][0]["message"]["content"]
     except (KeyError, IndexError):
         raise RuntimeError(f"Unexpected completion format: {body!r}")
-    
-    print("📦 Raw DeepSeek response:\n", content)  # 👈 for debugging
 
-    # 2) strip markdown fences if present
-    #    it will remove json ... or ...
+    parsed = _parse_slot_reply(content)
+    if key:
+        cache.set(key, content)
+    return parsed
 
-    fence_match = re.match(r"^```(?:json)?\s*([\s\S]*?)\s*```$", content.strip())
-    if fence_match:
-        content = fence_match.group(1)
+async def parse_with_deepseek_async(user_query: str, timeout: float = None) -> dict:
+    """Async parse_with_deepseek over the shared pooled HTTP/2 client."""
+    key = _slot_cache_key(user_query) if cache else None
+    if key and (cached := await cache.aget(key)) is not None:
+        return _parse_slot_reply(cached)
 
-    # 3) ensure non-empty
-    if not content.strip():
-        raise RuntimeError("DeepSeek reply was empty after stripping fences.")
-
-    # 4) parse JSON
-    try:
-        return json.loads(content)
-    except json.JSONDecodeError as e:
-        raise RuntimeError(f"Invalid JSON from DeepSeek: {e}\n--- Raw content ---\n{content}")
+    content = await chat_completion(
+        _slot_filling_messages(user_query), get_api_key(), timeout=timeout
+    )
+    parsed = _parse_slot_reply(content)
+    if key:
+        await cache.aset(key, content)
+    return parsed
 
 def call_local_predict(parsed: dict) -> dict:
     """
     Given parsed slots, POST to /predict_fault and return JSON reply.
+
+    CLI-only (--http): the API's own /ask uses prediction_service directly.
     """
     payload = {"turbine_id": parsed["turbine_id"]}
     if parsed.get("log_date"):
@@ -116,6 +169,21 @@ def call_local_predict(parsed: dict) -> dict:
         raise RuntimeError("Prediction request failed validation.")
     return resp.json()
 
+def call_local_risk_history(parsed: dict) -> dict:
+    """GET /turbines/{id}/risk_history for a risk_trend question (CLI --http)."""
+    url = f"{LOCAL_API_URL}/turbines/{parsed['turbine_id']}/risk_history"
+    params = {k: parsed[k] for k in ("start_date", "end_date", "days") if parsed.get(k)}
+    params["rolling"] = TREND_ROLLING_DAYS
+    try:
+        resp = session.get(url, params=params, timeout=30)
+        resp.raise_for_status()
+    except ConnectionError:
+        raise RuntimeError(f"Could not connect to {url}")
+    except HTTPError:
+        print("❌ Risk history request failed:", resp.status_code, resp.text)
+        raise RuntimeError("Risk history request failed.")
+    return resp.json()
+
 def generate_answer_with_deepseek(user_query: str, model_response: dict) -> str:
     turbine_id = model_response.get("turbine_id", "Unknown")
     date = model_response.get("log_date", "Unknown")
@@ -138,37 +206,67 @@ def generate_answer_with_deepseek(user_query: str, model_response: dict) -> str:
     Please explain why this turbine is at risk using simple language and suggest what the operator should check.
     """
 
-    return query_deepseek(prompt, os.getenv("OPENROUTER_API_KEY"))
+    return query_deepseek(prompt, get_api_key())
 
 
 # ─── FINAL CHATBOT REPLY ────────────────────────────────────
-def ask_turbine_bot(user_query: str):
+def ask_turbine_bot(user_query: str, use_http: bool = False):
     print(f"\n🔍 Query: {user_query!r}")
-    parsed = parse_with_deepseek(user_query)
+    from slot_parser import parse_slots
+    parsed = parse_slots(user_query) or parse_with_deepseek(user_query)
     print("✅ Parsed:", parsed)
 
-    prediction = call_local_predict(parsed)
+    if parsed.get("intent") == "risk_trend":
+        # Same path as ask_pipeline.trend_context: the whole range, one model call
+        if use_http:
+            history = call_local_risk_history(parsed)
+        else:
+            from prediction_service import risk_history
+            days = parsed.get("days")
+            history = risk_history(parsed["turbine_id"], parsed.get("start_date"), parsed.get("end_date"),
+                                   int(days) if days else None, 3, TREND_ROLLING_DAYS)
+        print(f"📈 Risk history: {history['count']} days, {history['start_date']} → {history['end_date']}")
+        full_prompt = generate_trend_prompt(user_query, format_risk_trend(history),
+                                            prepare_shap_for_prompt(history["explanations"]))
+        print("\n📨 Sending to DeepSeek...\n")
+        answer = query_deepseek(full_prompt, get_api_key())
+        print("\n💬 Answer:\n", answer)
+        return
+
+    if use_http:
+        prediction = call_local_predict(parsed)
+    else:
+        # Loads the model in this process; no API server needed
+        from prediction_service import predict_fault_for
+        prediction = predict_fault_for(parsed["turbine_id"], parsed.get("log_date"))
     print("🤖 Prediction:", prediction)
 
     # SHAP explanation formatting
     shap_text = prepare_shap_for_prompt(prediction["explanations"])
 
     # Error log formatting
-    turbine_id = parsed["turbine_id"]
-    log_date = parsed.get("log_date")
+    turbine_id = prediction["turbine_id"]
+    log_date = prediction["log_date"]
     error_summary = get_error_summary_for(turbine_id, log_date)
 
     # Final prompt to DeepSeek
     full_prompt = generate_deepseek_prompt(user_query, shap_text, error_summary)
     print("\n📨 Sending to DeepSeek...\n")
-    answer = query_deepseek(full_prompt, OPENROUTER_API_KEY)
+    answer = query_deepseek(full_prompt, get_api_key())
 
     print("\n💬 Answer:\n", answer)
 
 # ─── ENTRY POINT ─────────────────────────────────────────────
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ask the turbine-risk chatbot from the command line")
+    parser.add_argument("--http", action="store_true",
+                        help=f"call a running API at {LOCAL_PREDICT_URL} instead of predicting in-process")
+    args = parser.parse_args()
+
     question = input("🔍 Enter your turbine-risk question: ").strip()
     if not question:
         print("No question provided.")
     else:
-        ask_turbine_bot(question)
\ No newline at end of file
+        ask_turbine_bot(question, use_http=args.http)
\ No newline at end of file
@@ -1,4 +1,7 @@
 # auth.py
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -9,9 +12,19 @@ SECRET_KEY = "my_super_secret_key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt work factor for new hashes (each +1 doubles the cost); existing
+# hashes keep verifying with the rounds stored in them
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt calls run on this pool, never on the event loop or the default
+# thread pool, so a burst of logins queues here instead of stalling /ask
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 
 # ────────────── PASSWORD UTILS ──────────────
+# Routes (signup/login in routes/auth.py) must `await hash_password_async` /
+# `await verify_password_async`; the sync versions are for scripts and tests.
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -19,6 +32,14 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(
+        _hash_pool, verify_password, plain_password, hashed_password
+    )
+
 # ────────────── JWT UTILS ──────────────
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -0,0 +1,15 @@
+"""
+Offline benchmark harness for the API.
+
+    python -m benchmarks.run_benchmark --concurrency 16 --requests 500 --out bench.json
+    python -m benchmarks.run_benchmark --compare bench.json
+
+synthetic_data   SQLite stand-in for Postgres (wtg_master, wtg_model,
+                 wtg_features, error_logs, users, chats) + a small XGBoost
+                 model with the production feature columns
+fake_openrouter  local OpenRouter /chat/completions with configurable
+                 latency, token rate, errors and SSE streaming
+run_benchmark    starts both, runs the app under uvicorn, drives it at a
+                 fixed concurrency and writes p50/p95/p99, RPS and the
+                 Server-Timing stage breakdown as JSON
+"""
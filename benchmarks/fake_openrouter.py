@@ -0,0 +1,115 @@
+"""
+benchmarks/fake_openrouter.py
+
+Local stand-in for OpenRouter's POST /chat/completions.
+
+    python -m benchmarks.fake_openrouter --port 8090 --latency-ms 400 --token-ms 15 --tokens 120
+
+Point the app at it with OPENROUTER_BASE_URL=http://127.0.0.1:8090.
+
+• Slot-filling requests (the SLOT_FILLING_PROMPT system message) get a JSON
+  reply built from the turbine ID / ISO date found in the question.
+• Everything else gets a canned answer of --tokens words.
+• --latency-ms is the time to the first byte/token, --token-ms the gap
+  between streamed tokens (also added per token to non-streamed replies),
+  --error-rate the fraction of requests answered with a 503.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+from typing import Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+TURBINE_RE = re.compile(r"\b([A-Za-z]{1,4})[-\s]?(\d{1,4})\b")
+DATE_RE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+ANSWER_WORDS = ("The turbine shows elevated fault risk mainly because of recent fault time "
+                "and grid downtime; operators should inspect the pitch system and check "
+                "the generator temperature logs before the next high-wind period.").split()
+
+config = {
+    "latency_ms": float(os.getenv("FAKE_LLM_LATENCY_MS", "400")),
+    "token_ms": float(os.getenv("FAKE_LLM_TOKEN_MS", "15")),
+    "tokens": int(os.getenv("FAKE_LLM_TOKENS", "120")),
+    "error_rate": float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+}
+counters = {"requests": 0, "streamed": 0, "slot_filling": 0, "errors": 0}
+
+app = FastAPI(title="Fake OpenRouter")
+
+
+def _slot_reply(question: str) -> str:
+    m = TURBINE_RE.search(question)
+    parsed = {"intent": "fault_risk",
+              "turbine_id": f"{m.group(1).upper()}-{int(m.group(2)):03d}" if m else "LH-001"}
+    if d := DATE_RE.search(question):
+        parsed["log_date"] = d.group(0)
+    return json.dumps(parsed)
+
+
+def _reply_for(messages) -> Tuple[str, bool]:
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    if "slot" in system.lower():
+        return _slot_reply(user), True
+    words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(config["tokens"])]
+    return " ".join(words), False
+
+
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    counters["requests"] += 1
+    await asyncio.sleep(config["latency_ms"] / 1000.0)
+
+    if random.random() < config["error_rate"]:
+        counters["errors"] += 1
+        return JSONResponse(status_code=503, content={"error": {"message": "fake overload"}})
+
+    content, is_slot = _reply_for(body.get("messages", []))
+    if is_slot:
+        counters["slot_filling"] += 1
+        return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+    if body.get("stream"):
+        counters["streamed"] += 1
+
+        async def events():
+            for i, word in enumerate(content.split(" ")):
+                if i:
+                    await asyncio.sleep(config["token_ms"] / 1000.0)
+                chunk = {"choices": [{"delta": {"content": word if i == 0 else " " + word}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    # Non-streamed: the client still waits for the whole generation
+    await asyncio.sleep(config["token_ms"] * max(config["tokens"] - 1, 0) / 1000.0)
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+@app.get("/stats")
+def stats():
+    return {**config, **counters}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenRouter chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=config["latency_ms"])
+    parser.add_argument("--token-ms", type=float, default=config["token_ms"])
+    parser.add_argument("--tokens", type=int, default=config["tokens"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"])
+    args = parser.parse_args()
+    config.update(latency_ms=args.latency_ms, token_ms=args.token_ms,
+                  tokens=args.tokens, error_rate=args.error_rate)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
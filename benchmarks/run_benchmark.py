@@ -0,0 +1,339 @@
+"""
+benchmarks/run_benchmark.py
+
+End-to-end, offline benchmark of the API.
+
+    python -m benchmarks.run_benchmark --concurrency 16 --requests 500 --out bench.json
+    python -m benchmarks.run_benchmark --scenarios predict,my_chats --compare bench.json
+
+1. generates the synthetic SQLite dataset + model (benchmarks.synthetic_data)
+2. starts the fake OpenRouter server and `uvicorn app:app` against them
+3. waits for /readyz, sends a warm-up round, then drives each scenario
+   with --concurrency workers until --requests responses have arrived
+4. reports latency p50/p95/p99, requests/second, errors and the
+   Server-Timing stage breakdown (plus time-to-first-token for the SSE
+   scenario) as JSON; --compare prints the change against an earlier run
+
+Scenarios: predict (/predict_fault), ask (/ask), ask_stream (/ask/stream),
+my_chats (/my-chats).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.synthetic_data import generate, turbine_ids
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("predict", "ask", "ask_stream", "my_chats")
+
+# Questions the local slot parser resolves, and ones that fall back to the LLM
+RULE_QUESTIONS = [
+    "What is the fault risk of turbine {tid} on {day}?",
+    "Why is {tid} likely to fail on {day}?",
+    "Show the alarm log for {tid} on {day}",
+]
+LLM_QUESTIONS = ["How has {tid} been behaving lately?"]
+
+
+# ─── PROCESSES ─────────────────────────────────────────────────────────────────
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_process(args: List[str], env: dict, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen([sys.executable, *args], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(url: str, proc: subprocess.Popen, timeout: float = 120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"process exited with {proc.returncode} before {url} was ready")
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+# ─── REQUESTS ──────────────────────────────────────────────────────────────────
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    timings = {}
+    for part in (header or "").split(","):
+        name, _, rest = part.strip().partition(";")
+        if name and rest.startswith("dur="):
+            timings[name] = float(rest[4:])
+    return timings
+
+
+class Scenario:
+    def __init__(self, name: str, data: dict, rng: random.Random, token: str, llm_fraction: float):
+        self.name = name
+        self.rng = rng
+        self.token = token
+        self.llm_fraction = llm_fraction
+        self.turbines = turbine_ids(data["turbines"])
+        last = date.fromisoformat(data["last_date"])
+        self.days = [last - timedelta(days=d) for d in range(data["days"])]
+
+    def _question(self) -> str:
+        pool = LLM_QUESTIONS if self.rng.random() < self.llm_fraction else RULE_QUESTIONS
+        return self.rng.choice(pool).format(tid=self.rng.choice(self.turbines),
+                                            day=self.rng.choice(self.days).isoformat())
+
+    async def call(self, client: httpx.AsyncClient) -> dict:
+        t0 = time.perf_counter()
+        result = {"ok": True, "ttft_ms": None}
+        if self.name == "predict":
+            resp = await client.post("/predict_fault", json={
+                "turbine_id": self.rng.choice(self.turbines),
+                "log_date": self.rng.choice(self.days).isoformat(),
+            })
+            result["ok"] = resp.status_code == 200
+        elif self.name == "ask":
+            resp = await client.post("/ask", json={"question": self._question()})
+            # /ask reports pipeline failures as a 200 with a ⚠️ answer
+            result["ok"] = resp.status_code == 200 and not resp.json()["answer"].startswith("⚠️")
+        elif self.name == "ask_stream":
+            async with client.stream("POST", "/ask/stream", json={"question": self._question()}) as resp:
+                async for line in resp.aiter_lines():
+                    if line.startswith("event: token") and result["ttft_ms"] is None:
+                        result["ttft_ms"] = (time.perf_counter() - t0) * 1000.0
+                    elif line.startswith("event: error"):
+                        result["ok"] = False
+                    elif line.startswith("data:") and '"timings"' in line:
+                        result["timings"] = json.loads(line[5:]).get("timings", {})
+            result["ok"] = result["ok"] and resp.status_code == 200
+        elif self.name == "my_chats":
+            # First sidebar page, as the UI requests it
+            resp = await client.get("/my-chats", params={"light": "true"},
+                                    headers={"Authorization": f"Bearer {self.token}"})
+            result["ok"] = resp.status_code == 200
+        else:
+            raise ValueError(self.name)
+
+        result["latency_ms"] = (time.perf_counter() - t0) * 1000.0
+        result.setdefault("timings", parse_server_timing(resp.headers.get("server-timing")))
+        return result
+
+
+async def drive(base_url: str, scenario: Scenario, concurrency: int, total: int, warmup: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        await asyncio.gather(*(scenario.call(client) for _ in range(warmup)), return_exceptions=True)
+
+        results, remaining = [], [total]
+
+        async def worker():
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                try:
+                    results.append(await scenario.call(client))
+                except Exception as e:
+                    results.append({"ok": False, "latency_ms": None, "error": repr(e)})
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    return summarize(scenario.name, results, elapsed, concurrency)
+
+
+# ─── REPORT ────────────────────────────────────────────────────────────────────
+def _percentiles(values) -> Optional[dict]:
+    arr = np.array([v for v in values if v is not None], dtype=float)
+    if not arr.size:
+        return None
+    return {
+        "p50": round(float(np.percentile(arr, 50)), 2),
+        "p95": round(float(np.percentile(arr, 95)), 2),
+        "p99": round(float(np.percentile(arr, 99)), 2),
+        "mean": round(float(arr.mean()), 2),
+        "max": round(float(arr.max()), 2),
+    }
+
+
+def summarize(name: str, results: List[dict], elapsed: float, concurrency: int) -> dict:
+    ok = [r for r in results if r["ok"]]
+    stages = sorted({k for r in ok for k in r.get("timings", {})})
+    report = {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "seconds": round(elapsed, 3),
+        "rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        "latency_ms": _percentiles(r["latency_ms"] for r in ok),
+        "server_timing_ms": {s: _percentiles(r["timings"].get(s) for r in ok) for s in stages},
+    }
+    if name == "ask_stream":
+        report["ttft_ms"] = _percentiles(r["ttft_ms"] for r in ok)
+    sample_errors = [r["error"] for r in results if r.get("error")][:3]
+    if sample_errors:
+        report["sample_errors"] = sample_errors
+    return report
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_report(report: dict, baseline: Optional[dict] = None):
+    base = {s["scenario"]: s for s in (baseline or {}).get("scenarios", [])}
+
+    def delta(new, old):
+        if new is None or old is None or not old:
+            return ""
+        return f" ({(new - old) / old * 100:+.1f}%)"
+
+    print(f"\n📊 commit {report['commit']}  concurrency {report['config']['concurrency']}")
+    for s in report["scenarios"]:
+        b = base.get(s["scenario"], {})
+        lat, blat = s["latency_ms"] or {}, b.get("latency_ms") or {}
+        print(f"\n{s['scenario']}: {s['requests']} requests, {s['errors']} errors, "
+              f"{s['rps']} req/s{delta(s['rps'], b.get('rps'))}")
+        for p in ("p50", "p95", "p99"):
+            print(f"   {p}: {lat.get(p, 'n/a')} ms{delta(lat.get(p), blat.get(p))}")
+        if s.get("ttft_ms"):
+            print(f"   ttft p50: {s['ttft_ms']['p50']} ms"
+                  f"{delta(s['ttft_ms']['p50'], (b.get('ttft_ms') or {}).get('p50'))}")
+        for stage, st in s["server_timing_ms"].items():
+            if st:
+                old = ((b.get("server_timing_ms") or {}).get(stage) or {}).get("p50")
+                print(f"   stage {stage:14s} p50 {st['p50']:>9.2f} ms  p95 {st['p95']:>9.2f} ms{delta(st['p50'], old)}")
+
+
+# ─── MAIN ──────────────────────────────────────────────────────────────────────
+def run(args) -> dict:
+    workdir = args.workdir or tempfile.mkdtemp(prefix="wtg-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    db_path = os.path.join(workdir, "bench.sqlite3")
+    model_path = os.path.join(workdir, "models", "bench_model.json")
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    print(f"🧪 Generating synthetic data in {workdir} …")
+    data = generate(f"sqlite:///{db_path}", model_path, args.turbines, args.days,
+                    args.errors_per_day, args.chats, seed=args.seed)
+
+    llm_port, app_port = free_port(), free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "FAULT_MODEL_PATH": model_path,
+        "OPENROUTER_BASE_URL": f"http://127.0.0.1:{llm_port}",
+        "OPENROUTER_API_KEY": "bench",
+        "LLM_CACHE_ENABLED": "1" if args.llm_cache else "0",
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite3"),
+        "STARTUP_BLOCKING": "1",
+    }
+    procs = []
+    try:
+        llm = start_process(["-m", "benchmarks.fake_openrouter", "--port", str(llm_port),
+                             "--latency-ms", str(args.llm_latency_ms), "--token-ms", str(args.llm_token_ms),
+                             "--tokens", str(args.llm_tokens), "--error-rate", str(args.llm_error_rate)],
+                            env, os.path.join(workdir, "fake_openrouter.log"))
+        procs.append(llm)
+        wait_ready(f"http://127.0.0.1:{llm_port}/stats", llm)
+
+        api = start_process(["-m", "uvicorn", "app:app", "--port", str(app_port),
+                             "--workers", str(args.workers), "--log-level", "warning"],
+                            env, os.path.join(workdir, "app.log"))
+        procs.append(api)
+        wait_ready(f"http://127.0.0.1:{app_port}/readyz", api)
+
+        from auth import create_access_token
+        token = create_access_token({"sub": str(data["user_id"])})
+
+        rng = random.Random(args.seed)
+        results = []
+        for name in args.scenarios:
+            print(f"🚀 {name}: {args.requests} requests at concurrency {args.concurrency}")
+            scenario = Scenario(name, data, rng, token, args.llm_fraction)
+            results.append(asyncio.run(drive(f"http://127.0.0.1:{app_port}", scenario,
+                                             args.concurrency, args.requests, args.warmup)))
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "dataset": data,
+        "workdir": workdir,
+        "scenarios": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end API benchmark")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda s: [x.strip() for x in s.split(",") if x.strip()])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--turbines", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--errors-per-day", type=float, default=2.0)
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--llm-latency-ms", type=float, default=400)
+    parser.add_argument("--llm-token-ms", type=float, default=15)
+    parser.add_argument("--llm-tokens", type=int, default=120)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-fraction", type=float, default=0.2,
+                        help="share of /ask questions the slot parser can't resolve")
+    parser.add_argument("--llm-cache", action="store_true", help="leave the LLM response cache on")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="keep the dataset and logs here (default: a temp dir)")
+    parser.add_argument("--out", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    report = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.out}")
@@ -0,0 +1,166 @@
+"""
+benchmarks/synthetic_data.py
+
+Deterministic synthetic dataset + model for the benchmarks.
+
+    python -m benchmarks.synthetic_data --url sqlite:///bench.sqlite3 --turbines 50 --days 365
+
+Writes wtg_master, wtg_model, wtg_features, error_logs, users and
+chatbot_messages, and trains a small binary:logistic booster on the same
+14 feature columns as the production model.
+"""
+import argparse
+import random
+import uuid
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sqlalchemy import create_engine, text, types
+
+# Same columns, same order as shap_explainer.feature_cols (not imported:
+# that module would connect db.engine to DATABASE_URL)
+FEATURE_COLS = [
+    'gen_units', 'operating_hrs', 'avg_wind_speed', 'lull_hrs', 'fault_time',
+    'pm_shut_down', 'int_grid_down', 'ext_grid_down', 'capacity',
+    'downtime_hrs', 'availability', 'plf_percent', 'mttr', 'mtbf'
+]
+SITES = ["Lahori", "Jaisalmer", "Kutch", "Satara"]
+ALARMS = [
+    ("101", "Pitch system fault"), ("205", "Generator overtemperature"),
+    ("310", "Grid voltage out of range"), ("412", "Yaw misalignment"),
+    ("518", "Gearbox oil pressure low"), ("620", "Anemometer failure"),
+]
+BENCH_USER_EMAIL = "bench@example.com"
+
+
+def turbine_ids(n: int):
+    return [f"LH-{i:03d}" for i in range(1, n + 1)]
+
+
+def make_features(turbines, days: int, end: date, rng) -> pd.DataFrame:
+    dates = [end - timedelta(days=d) for d in range(days - 1, -1, -1)]
+    n = len(turbines) * len(dates)
+    df = pd.DataFrame({
+        "turbine_id": np.repeat(turbines, len(dates)),
+        "log_date": np.tile(dates, len(turbines)),
+    })
+    capacity = np.repeat(rng.choice([1.5, 2.0, 2.1], len(turbines)), len(dates))
+    fault = rng.exponential(0.6, n) * (rng.random(n) < 0.3)
+    grid = rng.exponential(0.3, n) * (rng.random(n) < 0.2)
+    df["fault_time"] = fault
+    df["pm_shut_down"] = rng.exponential(0.2, n) * (rng.random(n) < 0.05)
+    df["int_grid_down"] = grid
+    df["ext_grid_down"] = rng.exponential(0.3, n) * (rng.random(n) < 0.1)
+    df["downtime_hrs"] = df[["fault_time", "pm_shut_down", "int_grid_down", "ext_grid_down"]].sum(axis=1)
+    df["lull_hrs"] = rng.uniform(0, 6, n)
+    df["operating_hrs"] = np.clip(24 - df["downtime_hrs"] - df["lull_hrs"], 0, 24)
+    df["avg_wind_speed"] = rng.gamma(4.0, 1.6, n)
+    df["capacity"] = capacity
+    df["gen_units"] = df["operating_hrs"] * capacity * np.clip(df["avg_wind_speed"] / 12, 0, 1) * 1000
+    df["availability"] = df["operating_hrs"] / (df["operating_hrs"] + df["downtime_hrs"]).replace(0, np.nan)
+    df["plf_percent"] = df["gen_units"] / (capacity * 1000 * 24) * 100
+    df["mttr"] = rng.gamma(2.0, 0.8, n)
+    df["mtbf"] = rng.gamma(3.0, 40.0, n)
+    risk = 1.5 * df["fault_time"] + 0.02 * df["avg_wind_speed"] ** 2 - 0.01 * df["mtbf"] - 1.0
+    df["will_fault_occur"] = (risk + rng.normal(0, 0.5, n) > 0).astype(int)
+    return df[["turbine_id", "log_date"] + FEATURE_COLS + ["will_fault_occur"]]
+
+
+def make_error_logs(turbines, days: int, end: date, per_day: float, rng) -> pd.DataFrame:
+    start = datetime.combine(end - timedelta(days=days - 1), datetime.min.time())
+    n = rng.poisson(per_day * len(turbines) * days)
+    codes = rng.integers(0, len(ALARMS), n)
+    df = pd.DataFrame({
+        "turbine_id": rng.choice(turbines, n),
+        "error_time": start + pd.to_timedelta(rng.uniform(0, days * 86400, n), unit="s"),
+        "alarm_code": [ALARMS[c][0] for c in codes],
+        "short_description": [ALARMS[c][1] for c in codes],
+        "duration": pd.to_timedelta(rng.integers(30, 7200, n), unit="s").astype(str).str.replace("0 days ", ""),
+    })
+    return df.sort_values(["turbine_id", "error_time"]).reset_index(drop=True)
+
+
+def train_model(features: pd.DataFrame, path: str, seed: int = 0):
+    dtrain = xgb.DMatrix(features[FEATURE_COLS].astype(np.float32), label=features["will_fault_occur"],
+                         feature_names=FEATURE_COLS)
+    params = {"objective": "binary:logistic", "max_depth": 5, "eta": 0.1, "seed": seed}
+    xgb.train(params, dtrain, num_boost_round=100).save_model(path)
+
+
+def generate(url: str, model_path: str, turbines: int = 50, days: int = 365,
+             errors_per_day: float = 2.0, chats: int = 500, end: date = date(2025, 6, 30),
+             seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    ids = turbine_ids(turbines)
+    engine = create_engine(url)
+
+    master = pd.DataFrame({
+        "turbine_id": ids,
+        "site": [SITES[i % len(SITES)] for i in range(turbines)],
+        "area": [f"Area-{i % 3 + 1}" for i in range(turbines)],
+        "cluster": [f"C{i % 5 + 1}" for i in range(turbines)],
+        "state": ["Rajasthan" if i % 2 else "Gujarat" for i in range(turbines)],
+    })
+    features = make_features(ids, days, end, rng)
+    model = features.groupby("turbine_id", as_index=False)["capacity"].first().assign(wtg_model="S88")
+    errors = make_error_logs(ids, days, end, errors_per_day, rng)
+
+    with engine.begin() as conn:
+        master.to_sql("wtg_master", conn, if_exists="replace", index=False)
+        model.to_sql("wtg_model", conn, if_exists="replace", index=False)
+        features.to_sql("wtg_features", conn, if_exists="replace", index=False,
+                        dtype={"log_date": types.Date}, chunksize=10_000)
+        errors.to_sql("error_logs", conn, if_exists="replace", index=False,
+                      dtype={"error_time": types.DateTime}, chunksize=10_000)
+        conn.execute(text("CREATE UNIQUE INDEX ux_wtg_features_turbine_date ON wtg_features (turbine_id, log_date)"))
+        conn.execute(text("CREATE INDEX ix_error_logs_turbine_time ON error_logs (turbine_id, error_time)"))
+
+    # users / chatbot_messages come from the app's own models
+    from models import Base
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        user_id = conn.execute(text(
+            "INSERT INTO users (email, hashed_password, created_at) VALUES (:e, 'x', :now) RETURNING id"
+        ), {"e": BENCH_USER_EMAIL, "now": datetime.utcnow()}).scalar()
+        now = datetime.utcnow()
+        ids_rng = random.Random(seed)
+        conn.execute(text("""
+            INSERT INTO chatbot_messages (chat_id, user_id, user_message, bot_response, intent, created_at)
+            VALUES (:chat_id, :user_id, :q, :a, 'fault_risk', :created_at)
+        """), [
+            {"chat_id": uuid.UUID(int=ids_rng.getrandbits(128), version=4).hex, "user_id": user_id, "q": f"Fault risk of {ids[i % turbines]}?",
+             "a": "Synthetic answer " * 20, "created_at": now - timedelta(minutes=i)}
+            for i in range(chats)
+        ])
+
+    train_model(features, model_path, seed)
+    engine.dispose()
+    return {
+        "turbines": turbines,
+        "days": days,
+        "feature_rows": len(features),
+        "error_rows": len(errors),
+        "chats": chats,
+        "user_id": user_id,
+        "first_date": str(features["log_date"].min()),
+        "last_date": str(end),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the synthetic benchmark dataset")
+    parser.add_argument("--url", default="sqlite:///bench.sqlite3")
+    parser.add_argument("--model", default="bench_model.json")
+    parser.add_argument("--turbines", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--errors-per-day", type=float, default=2.0)
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    info = generate(args.url, args.model, args.turbines, args.days, args.errors_per_day, args.chats,
+                    seed=args.seed)
+    print("✅ Generated:", info)
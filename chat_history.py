@@ -0,0 +1,104 @@
+"""
+chat_history.py
+
+Keyset pagination over a user's chats for GET /my-chats.
+
+Pages are ordered newest first on (created_at, id) and continue from an
+opaque `before` cursor instead of an OFFSET, so every page is one range
+scan of ix_chatbot_messages_user_created (user_id, created_at, id) no
+matter how deep the user scrolls:
+
+    page = list_chats(db, user_id, limit=30)
+    page = list_chats(db, user_id, limit=30, before=page["next_cursor"])
+
+light=True returns only what the sidebar list shows: id, chat_id, the
+first TITLE_CHARS characters of the question and created_at.  The full
+chat is then fetched with get_chat() when it is opened.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
+
+from models import ChatMessage
+
+DEFAULT_LIMIT = 30
+MAX_LIMIT     = 200
+TITLE_CHARS   = 80
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# ─── CURSORS ───────────────────────────────────────────────────────────────────
+def encode_cursor(created_at: datetime, chat_pk: int) -> str:
+    raw = json.dumps([created_at.isoformat(), chat_pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, chat_pk = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(chat_pk)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+# ─── QUERIES ───────────────────────────────────────────────────────────────────
+def _row(r, light: bool) -> dict:
+    item = {
+        "id": r.id,
+        "chat_id": str(r.chat_id) if r.chat_id is not None else None,
+        "question": r.question,
+        "created_at": r.created_at,
+    }
+    if not light:
+        item["answer"] = r.answer
+        item["intent"] = r.intent
+    return item
+
+
+def list_chats(db: Session, user_id: int, limit: int = DEFAULT_LIMIT,
+               before: Optional[str] = None, light: bool = False) -> dict:
+    """
+    {"items": [...], "next_cursor": str | None}, newest first.
+    Raises InvalidCursor for a malformed `before`.
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    question = (func.substr(ChatMessage.user_message, 1, TITLE_CHARS) if light
+                else ChatMessage.user_message)
+    cols = [ChatMessage.id, ChatMessage.chat_id, question.label("question"), ChatMessage.created_at]
+    if not light:
+        cols += [ChatMessage.bot_response.label("answer"), ChatMessage.intent]
+
+    stmt = (
+        select(*cols)
+        .where(ChatMessage.user_id == user_id)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(limit + 1)  # one extra row tells whether another page exists
+    )
+    if before:
+        created_at, chat_pk = decode_cursor(before)
+        stmt = stmt.where(tuple_(ChatMessage.created_at, ChatMessage.id) < tuple_(created_at, chat_pk))
+
+    rows = db.execute(stmt).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": [_row(r, light) for r in rows],
+        "next_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if more else None,
+    }
+
+
+def get_chat(db: Session, user_id: int, chat_pk: int) -> Optional[dict]:
+    r = db.execute(
+        select(ChatMessage.id, ChatMessage.chat_id, ChatMessage.user_message.label("question"),
+               ChatMessage.created_at, ChatMessage.bot_response.label("answer"), ChatMessage.intent)
+        .where(ChatMessage.id == chat_pk, ChatMessage.user_id == user_id)
+    ).first()
+    return _row(r, light=False) if r else None
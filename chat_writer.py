@@ -0,0 +1,299 @@
+"""
+chat_writer.py
+
+Write-behind persistence for chat messages.
+
+/ask used to open a session, insert one ChatMessage and commit before
+answering.  Now the request only queues the row; one worker thread takes
+the first waiting row, keeps collecting for up to `flush_ms` or until
+`batch_size` rows are waiting, then writes them all with a single
+executemany INSERT in one transaction.
+
+    writer = get_writer()
+    writer.submit(user_id, question, answer, intent)
+    ...
+    shutdown()   # drains the queue (app lifespan)
+
+created_at and chat_id are set at submit time, so history order does not
+depend on when a batch happens to be flushed.
+
+If a flush fails (Postgres down, pool exhausted, …) the batch is appended
+to CHAT_SPILL_PATH as JSON lines instead of being dropped, and so is
+anything submitted while the queue is full.  The spill file is replayed
+when the writer starts and after later successful flushes.
+
+A batch rejected for what is in it (constraint violation, bad value) is
+retried row by row; rows that still fail are appended to
+CHAT_DEAD_LETTER_PATH with the error and are not retried, so one bad row
+never holds back the rest of its batch or the replay.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import exc, insert
+
+import telemetry
+from db import engine
+from models import ChatMessage
+
+CHAT_WRITE_BEHIND  = os.getenv("CHAT_WRITE_BEHIND", "1") == "1"
+CHAT_BATCH_SIZE    = int(os.getenv("CHAT_BATCH_SIZE", "200"))
+CHAT_FLUSH_MS      = float(os.getenv("CHAT_FLUSH_MS", "500"))
+CHAT_MAX_QUEUE     = int(os.getenv("CHAT_MAX_QUEUE", "10000"))
+CHAT_SPILL_PATH    = os.getenv("CHAT_SPILL_PATH", "chat_spill.jsonl")
+CHAT_DEAD_LETTER_PATH = os.getenv("CHAT_DEAD_LETTER_PATH", "chat_dead_letter.jsonl")
+CHAT_REPLAY_EVERY  = float(os.getenv("CHAT_REPLAY_SECONDS", "30"))
+
+_STOP = object()
+log = logging.getLogger("wtg.chat_writer")
+
+# The database (or the schema) is the problem, not the rows: keep them for replay
+_TRANSIENT_ERRORS = (exc.OperationalError, exc.InterfaceError, exc.ProgrammingError,
+                     exc.DisconnectionError, exc.TimeoutError)
+
+
+def _transient(e: Exception) -> bool:
+    return isinstance(e, _TRANSIENT_ERRORS) or getattr(e, "connection_invalidated", False)
+
+
+class ChatWriter:
+    def __init__(self, batch_size: int = CHAT_BATCH_SIZE, flush_ms: float = CHAT_FLUSH_MS,
+                 max_queue: int = CHAT_MAX_QUEUE, spill_path: str = CHAT_SPILL_PATH,
+                 dead_letter_path: str = CHAT_DEAD_LETTER_PATH, bind=engine):
+        self.batch_size = batch_size
+        self.window = flush_ms / 1000.0
+        self.spill_path = spill_path
+        self.dead_letter_path = dead_letter_path
+        self.bind = bind
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._written = 0
+        self._batches = 0
+        self._spilled = 0
+        self._replayed = 0
+        self._dead_lettered = 0
+        self._errors = 0
+        self._last_flush_ms = None
+        self._last_replay = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="chat-writer", daemon=True)
+        self._thread.start()
+
+    # ─── CALLER SIDE ──────────────────────────────────────────────────────────
+    def submit(self, user_id: Optional[int], question: str, answer: str, intent: Optional[str]):
+        """Queue one chat row; never blocks on the database."""
+        row = {
+            "chat_id": uuid.uuid4(),
+            "user_id": user_id,
+            "user_message": question,
+            "bot_response": answer,
+            "intent": intent,
+            "created_at": datetime.now(timezone.utc),
+        }
+        with self._lock:
+            self._submitted += 1
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._spill([row])
+
+    def close(self, timeout: float = 10.0):
+        """Flush everything queued so far and stop the worker."""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # ─── WORKER ───────────────────────────────────────────────────────────────
+    def _collect(self) -> Optional[List[dict]]:
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)  # flush this batch, stop on the next loop
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        self._replay()
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            if self._flush(batch) and time.monotonic() - self._last_replay > CHAT_REPLAY_EVERY:
+                self._replay()
+
+    def _insert(self, rows: List[dict]):
+        with self.bind.begin() as conn:
+            conn.execute(insert(ChatMessage.__table__), rows)
+
+    def _write(self, rows: List[dict]) -> Tuple[int, List[dict], Optional[Exception]]:
+        """
+        (written, unwritten, error).  A batch rejected for its contents is
+        retried row by row and the rows that still fail are dead-lettered;
+        on a transient error the rows not yet written come back unwritten.
+        """
+        try:
+            self._insert(rows)
+            return len(rows), [], None
+        except Exception as e:
+            if _transient(e):
+                return 0, rows, e
+        written = 0
+        for i, row in enumerate(rows):
+            try:
+                self._insert([row])
+                written += 1
+            except Exception as e:
+                if _transient(e):
+                    return written, rows[i:], e
+                self._dead_letter([row], e)
+        return written, [], None
+
+    def _flush(self, batch: List[dict]) -> bool:
+        t0 = time.perf_counter()
+        written, unwritten, error = self._write(batch)
+        elapsed = time.perf_counter() - t0
+        with self._lock:
+            self._written += written
+        if unwritten:
+            log.warning("❌ Chat flush of %d rows failed, spilling to %s: %s",
+                        len(unwritten), self.spill_path, error)
+            with self._lock:
+                self._errors += 1
+            self._spill(unwritten)
+            return False
+        telemetry.record("chat_flush", elapsed)
+        with self._lock:
+            self._batches += 1
+            self._last_flush_ms = elapsed * 1000.0
+        return True
+
+    # ─── SPILL / DEAD-LETTER FILES ────────────────────────────────────────────
+    def _append(self, path: str, rows: List[dict], **extra):
+        lines = "".join(
+            json.dumps({**r, "chat_id": str(r["chat_id"]), "created_at": r["created_at"].isoformat(), **extra},
+                       default=str) + "\n"
+            for r in rows
+        )
+        with self._lock:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+    def _spill(self, rows: List[dict], count: bool = True):
+        self._append(self.spill_path, rows)
+        if count:
+            with self._lock:
+                self._spilled += len(rows)
+
+    def _dead_letter(self, rows: List[dict], error: Exception):
+        # The driver error only: the full statement would put chat text in the log
+        log.error("❌ %d chat row(s) rejected, moved to %s: %s", len(rows), self.dead_letter_path,
+                  getattr(error, "orig", None) or error)
+        self._append(self.dead_letter_path, rows, error=f"{type(error).__name__}: {error}"[:1000])
+        with self._lock:
+            self._dead_lettered += len(rows)
+
+    def _replay(self):
+        """Move the spill file aside and insert its rows; on failure they go back."""
+        self._last_replay = time.monotonic()
+        if not os.path.exists(self.spill_path):
+            return
+        # Renamed per process, so two workers never replay the same rows
+        replaying = f"{self.spill_path}.{os.getpid()}.replay"
+        try:
+            with self._lock:
+                os.replace(self.spill_path, replaying)
+        except FileNotFoundError:
+            return
+
+        rows = []
+        with open(replaying, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    r = json.loads(line)
+                    r["chat_id"] = uuid.UUID(r["chat_id"])
+                    r["created_at"] = datetime.fromisoformat(r["created_at"])
+                except (ValueError, KeyError, TypeError) as e:
+                    # Unreadable line (e.g. torn by a crash mid-write): keep it verbatim
+                    with self._lock:
+                        with open(self.dead_letter_path, "a", encoding="utf-8") as dead:
+                            dead.write(json.dumps({"raw": line.rstrip("\n"), "error": str(e)}) + "\n")
+                        self._dead_lettered += 1
+                    continue
+                rows.append(r)
+
+        written = 0
+        for start in range(0, len(rows), self.batch_size):
+            n, unwritten, error = self._write(rows[start:start + self.batch_size])
+            written += n
+            if unwritten:
+                log.warning("⚠️ Chat spill replay failed, keeping %s: %s", self.spill_path, error)
+                # Earlier batches were committed and bad rows dead-lettered; put back the rest
+                self._spill(unwritten + rows[start + self.batch_size:], count=False)
+                break
+        else:
+            log.info("✅ Replayed %d spilled chats", written)
+        with self._lock:
+            self._replayed += written
+        os.remove(replaying)
+
+    # ─── STATS ────────────────────────────────────────────────────────────────
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "batch_size": self.batch_size,
+                "flush_ms": self.window * 1000.0,
+                "queue_depth": self._queue.qsize(),
+                "submitted": self._submitted,
+                "written": self._written,
+                "batches": self._batches,
+                "avg_batch_size": self._written / self._batches if self._batches else None,
+                "last_flush_ms": self._last_flush_ms,
+                "errors": self._errors,
+                "spilled": self._spilled,
+                "replayed": self._replayed,
+                "dead_lettered": self._dead_lettered,
+                "spill_pending": os.path.exists(self.spill_path),
+            }
+
+
+# ─── PROCESS-WIDE WRITER ───────────────────────────────────────────────────────
+_writer: Optional[ChatWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> ChatWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ChatWriter()
+        return _writer
+
+
+def shutdown(timeout: float = 10.0):
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close(timeout)
@@ -0,0 +1,231 @@
+"""
+compiled_model.py
+
+Fault probability straight from a NumPy float array, without a DMatrix.
+
+compile_booster() flattens every tree of a binary:logistic gbtree model
+into parallel node arrays (split feature, threshold, left/right child,
+default direction, leaf value).  Leaves point at themselves, so scoring is
+`max_depth` vectorised steps over all trees at once, then a sum of the
+reached leaves and a sigmoid.  Splits follow XGBoost exactly: float32
+`x < threshold` goes left, NaN takes the default branch.
+
+    compiled = compile_booster(booster)
+    prob = compiled.predict_proba_row(x, names)   # x: 1-D
+    probs = compiled.predict_proba(X, names)      # X: 2-D; names reorder columns if needed
+
+Probability only: SHAP contributions still come from the native
+pred_contribs call (native_explainer.py).  Built for one row at a time;
+for large batches XGBoost's own predict is faster.
+
+Run this file directly for the correctness check against Booster.predict
+and a single-row / batch microbenchmark:
+    python compiled_model.py [--model models/xgb_fault_classifier_final.json] [--rows 2000]
+"""
+import json
+import math
+from typing import List, Optional
+
+import numpy as np
+import xgboost as xgb
+
+DEFAULT_MODEL_PATH = "models/xgb_fault_classifier_final.json"
+SUPPORTED_OBJECTIVES = {"binary:logistic", "reg:logistic"}
+
+
+class CompiledModel:
+    __slots__ = ("feature", "threshold", "left", "right", "default_left", "value", "roots",
+                 "depth", "base_margin", "feature_names")
+
+    def __init__(self, feature, threshold, left, right, default_left, value, roots,
+                 depth: int, base_margin: float, feature_names: List[str]):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.base_margin = base_margin
+        self.feature_names = feature_names
+
+    @property
+    def num_trees(self) -> int:
+        return len(self.roots)
+
+    # ─── SCORING ──────────────────────────────────────────────────────────────
+    def _model_order(self, X, feature_names: Optional[List[str]]):
+        """Put the last axis of X in model column order when its names differ."""
+        if feature_names is None or not self.feature_names or list(feature_names) == self.feature_names:
+            return X
+        position = {name: i for i, name in enumerate(feature_names)}
+        return np.asarray(X)[..., [position[name] for name in self.feature_names]]
+
+    def margin_row(self, x: np.ndarray) -> float:
+        x = np.asarray(x, dtype=np.float32)
+        node = self.roots
+        for _ in range(self.depth):
+            v = x[self.feature[node]]
+            go_left = np.where(np.isnan(v), self.default_left[node], v < self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return float(self.value[node].sum(dtype=np.float64)) + self.base_margin
+
+    def predict_proba_row(self, x: np.ndarray, feature_names: Optional[List[str]] = None) -> float:
+        return 1.0 / (1.0 + math.exp(-self.margin_row(self._model_order(x, feature_names))))
+
+    def margin(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            v = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(v), self.default_left[node], v < self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node].sum(axis=1, dtype=np.float64) + self.base_margin
+
+    def predict_proba(self, X, feature_names: Optional[List[str]] = None) -> np.ndarray:
+        """
+        Probabilities for a 2-D array (or DataFrame).  With feature_names,
+        columns are put in model order first.
+        """
+        return 1.0 / (1.0 + np.exp(-self.margin(self._model_order(X, feature_names))))
+
+
+# ─── COMPILER ──────────────────────────────────────────────────────────────────
+def _base_margin(learner: dict) -> float:
+    raw = learner["learner_model_param"]["base_score"]
+    base_score = float(raw.strip("[]").split(",")[0])  # "[2.35E-1]" in XGBoost 3, "2.35E-1" before
+    return math.log(base_score / (1.0 - base_score))
+
+
+def compile_booster(booster: xgb.Booster) -> CompiledModel:
+    """Flatten a binary:logistic gbtree booster.  Raises ValueError for anything else."""
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    objective = learner["objective"]["name"]
+    gbm = learner["gradient_booster"]
+    if objective not in SUPPORTED_OBJECTIVES:
+        raise ValueError(f"Compiled model supports {sorted(SUPPORTED_OBJECTIVES)}, not {objective}")
+    if gbm["name"] != "gbtree":
+        raise ValueError(f"Compiled model supports gbtree boosters, not {gbm['name']}")
+    if int(learner["learner_model_param"].get("num_target", "1")) != 1:
+        raise ValueError("Compiled model supports single-target models only")
+
+    feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+    depth, offset = 0, 0
+    for tree in gbm["model"]["trees"]:
+        if any(tree["split_type"]) or int(tree["tree_param"].get("size_leaf_vector", "1")) > 1:
+            raise ValueError("Compiled model does not support categorical splits or vector leaves")
+        lc = np.asarray(tree["left_children"], dtype=np.int64)
+        rc = np.asarray(tree["right_children"], dtype=np.int64)
+        is_leaf = lc == -1
+        ids = np.arange(len(lc)) + offset
+
+        feature.append(np.where(is_leaf, 0, tree["split_indices"]))
+        threshold.append(np.asarray(tree["split_conditions"], dtype=np.float32))
+        left.append(np.where(is_leaf, ids, lc + offset))   # leaves loop on themselves
+        right.append(np.where(is_leaf, ids, rc + offset))
+        default_left.append(np.asarray(tree["default_left"], dtype=bool))
+        value.append(np.where(is_leaf, tree["split_conditions"], 0.0))  # leaf value lives in split_conditions
+        roots.append(offset)
+
+        node_depth = np.zeros(len(lc), dtype=np.int64)
+        for n in range(len(lc)):  # children always come after their parent
+            if not is_leaf[n]:
+                node_depth[lc[n]] = node_depth[rc[n]] = node_depth[n] + 1
+        depth = max(depth, int(node_depth.max()))
+        offset += len(lc)
+
+    return CompiledModel(
+        feature=np.concatenate(feature).astype(np.intp),
+        threshold=np.concatenate(threshold),
+        left=np.concatenate(left).astype(np.intp),
+        right=np.concatenate(right).astype(np.intp),
+        default_left=np.concatenate(default_left),
+        value=np.concatenate(value).astype(np.float32),
+        roots=np.asarray(roots, dtype=np.intp),
+        depth=depth,
+        base_margin=_base_margin(learner),
+        feature_names=list(booster.feature_names or []),
+    )
+
+
+# ─── CORRECTNESS CHECK AND MICROBENCHMARK ──────────────────────────────────────
+def _synthetic_rows(n_features: int, rows: int, seed: int) -> np.ndarray:
+    # Same distribution as native_explainer.check_parity, NaNs included
+    rng = np.random.default_rng(seed)
+    data = rng.lognormal(mean=1.0, sigma=1.5, size=(rows, n_features)).astype(np.float32)
+    data[rng.random(data.shape) < 0.05] = np.nan
+    return data
+
+
+def check_correctness(booster: xgb.Booster, compiled: CompiledModel, rows: int = 2000,
+                      seed: int = 42, atol: float = 1e-5) -> dict:
+    """Compare with Booster.predict on synthetic rows.  Raises AssertionError on mismatch."""
+    X = _synthetic_rows(booster.num_features(), rows, seed)
+    ref = booster.predict(xgb.DMatrix(X, feature_names=booster.feature_names))
+    batch_diff = float(np.max(np.abs(compiled.predict_proba(X) - ref)))
+    row_diff = float(max(abs(compiled.predict_proba_row(x) - r) for x, r in zip(X[:200], ref[:200])))
+    assert batch_diff <= atol, f"Probability mismatch: max |diff| = {batch_diff:.2e}"
+    assert row_diff <= atol, f"Single-row mismatch: max |diff| = {row_diff:.2e}"
+    return {"rows": rows, "max_prob_diff": batch_diff, "max_row_prob_diff": row_diff}
+
+
+def _median_us(fn, iterations: int) -> float:
+    import time
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return float(np.median(samples) * 1e6)
+
+
+def benchmark(booster: xgb.Booster, compiled: CompiledModel, iterations: int = 2000,
+              batch_rows: int = 1000) -> dict:
+    """Median µs per call: the current DataFrame + DMatrix paths vs the compiled model."""
+    import pandas as pd
+    from native_explainer import predict_with_contributions
+
+    names = booster.feature_names
+    X = _synthetic_rows(booster.num_features(), batch_rows, seed=7)
+    df_row = pd.DataFrame(X[:1], columns=names)
+    x = X[0]
+    return {
+        "single_row_us": {
+            "dmatrix_predict": _median_us(lambda: booster.predict(xgb.DMatrix(df_row)), iterations),
+            "predict_with_contributions": _median_us(
+                lambda: predict_with_contributions(booster, X[:1], names), iterations),
+            "compiled": _median_us(lambda: compiled.predict_proba_row(x), iterations),
+        },
+        f"batch_{batch_rows}_us": {
+            "dmatrix_predict": _median_us(
+                lambda: booster.predict(xgb.DMatrix(X, feature_names=names)), max(iterations // 20, 10)),
+            "compiled": _median_us(lambda: compiled.predict_proba(X), max(iterations // 20, 10)),
+        },
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compiled tree model: correctness check and microbenchmark")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    booster = xgb.Booster()
+    booster.load_model(args.model)
+    compiled = compile_booster(booster)
+    print(f"Compiled {compiled.num_trees} trees, {len(compiled.value)} nodes, depth {compiled.depth}")
+
+    result = check_correctness(booster, compiled, rows=args.rows)
+    print("✅ Compiled model matches Booster.predict:")
+    for k, v in result.items():
+        print(f"  {k}: {v}")
+
+    for group, timings in benchmark(booster, compiled, args.iterations).items():
+        print(f"{group} (median):")
+        for k, v in timings.items():
+            print(f"  {k:<28} {v:10.1f} µs")
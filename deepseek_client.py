@@ -1,10 +1,39 @@
 import requests
 import os
 import json
-from pprint import pformat
+import logging
 
+import telemetry
+from llm_cache import cache
+from openrouter_client import (
+    OPENROUTER_URL, DEEPSEEK_MODEL, OPENROUTER_TIMEOUT,
+    chat_completion, stream_chat_completion,
+)
+
+SYSTEM_PROMPT = "You are a helpful assistant that explains wind turbine faults."
+
+# Keep-alive session for the synchronous path (CLI / scripts)
+_session = requests.Session()
+
+log = logging.getLogger("wtg.deepseek")
+
+
+def _answer_messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _cache_key(prompt: str) -> str:
+    return cache.make_key(DEEPSEEK_MODEL, _answer_messages(prompt))
+
+
+def query_deepseek(prompt: str, api_key: str, cache_tag: str = None) -> str:
+    key = _cache_key(prompt) if cache else None
+    if key and (cached := cache.get(key)) is not None:
+        return cached
 
-def query_deepseek(prompt: str, api_key: str) -> str:
     headers = {
         "Authorization": f"Bearer {api_key}",
         "HTTP-Referer": "http://localhost",  # or your project URL
@@ -13,35 +42,71 @@ def query_deepseek(prompt: str, api_key: str) -> str:
     }
 
     payload = {
-        "model": "deepseek/deepseek-chat",  # ✅ correct model ID for OpenRouter
-        "messages": [
-            {"role": "system", "content": "You are a helpful assistant that explains wind turbine faults."},
-            {"role": "user", "content": prompt}
-        ]
+        "model": DEEPSEEK_MODEL,  # ✅ correct model ID for OpenRouter
+        "messages": _answer_messages(prompt)
     }
 
+    # Payloads are only serialised for the sampled fraction of calls
+    if telemetry.sampled(log):
+        log.debug("📦 Sending payload to OpenRouter: %s", json.dumps(payload)[:1000])
+    response = None
     try:
-        print("📦 Sending payload to OpenRouter...\n", json.dumps(payload, indent=2)[:1000])
-        response = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=payload)
-
-        print("✅ Status Code:", response.status_code)
-        print("📥 Raw response:", response.text[:500])  # Limit output for readability
+        response = _session.post(OPENROUTER_URL, headers=headers, json=payload, timeout=OPENROUTER_TIMEOUT)
+        if telemetry.sampled(log):
+            log.debug("📥 %s raw response: %s", response.status_code, response.text[:500])
 
         response.raise_for_status()
 
         json_resp = response.json()
-        return json_resp["choices"][0]["message"]["content"]
+        answer = json_resp["choices"][0]["message"]["content"]
+        telemetry.UPSTREAM_REQUESTS.labels("openrouter", "ok").inc()
+        if key:
+            cache.set(key, answer, cache_tag)
+        return answer
 
     except requests.exceptions.HTTPError as e:
-        print("❌ HTTP error:", e)
-        print("🔍 Response content:", response.text)
+        telemetry.UPSTREAM_REQUESTS.labels("openrouter", "error").inc()
+        log.warning("❌ HTTP error: %s | %s", e, response.text[:200])
         raise
     except ValueError as e:
-        print("❌ JSON decode error:", e)
-        print("⚠️ Response content was not valid JSON:", response.text)
+        telemetry.UPSTREAM_REQUESTS.labels("openrouter", "error").inc()
+        log.warning("❌ Response was not valid JSON: %s | %s", e, response.text[:200])
+        raise
+    except requests.exceptions.RequestException:
+        telemetry.UPSTREAM_REQUESTS.labels("openrouter", "error").inc()
         raise
 
 
+async def query_deepseek_async(prompt: str, api_key: str = None, timeout: float = None,
+                               cache_tag: str = None) -> str:
+    """Async query_deepseek over the shared pooled HTTP/2 client."""
+    key = _cache_key(prompt) if cache else None
+    if key and (cached := await cache.aget(key)) is not None:
+        return cached
+
+    answer = await chat_completion(_answer_messages(prompt), api_key, timeout=timeout)
+    if key:
+        await cache.aset(key, answer, cache_tag)
+    return answer
+
+
+async def stream_deepseek_async(prompt: str, api_key: str = None, timeout: float = None,
+                                cache_tag: str = None):
+    """Streaming query_deepseek: async iterator over answer text deltas."""
+    key = _cache_key(prompt) if cache else None
+    if key and (cached := await cache.aget(key)) is not None:
+        yield cached
+        return
+
+    parts = []
+    async for delta in stream_chat_completion(_answer_messages(prompt), api_key, timeout=timeout):
+        parts.append(delta)
+        yield delta
+    # Only complete answers are cached
+    if key:
+        await cache.aset(key, "".join(parts), cache_tag)
+
+
 def generate_answer_with_deepseek(user_query: str, model_response: dict) -> str:
     # Safely extract and fallback for missing keys
     turbine_id = model_response.get("turbine_id", "Unknown")
@@ -72,7 +137,8 @@ def generate_answer_with_deepseek(user_query: str, model_response: dict) -> str:
 Please explain why this turbine might be at risk in simple language. Also suggest what the operator should check.
 """.strip()
 
-    print("🧠 Final prompt sent to DeepSeek:\n", prompt[:1000])  # Truncate for safety
+    if telemetry.sampled(log):
+        log.debug("🧠 Final prompt sent to DeepSeek: %s", prompt[:1000])
 
     api_key = os.getenv("OPENROUTER_API_KEY")
     if not api_key:
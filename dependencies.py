@@ -1,12 +1,33 @@
 # dependencies.py
-from fastapi import Depends, HTTPException, status
+import hmac
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from db import SessionLocal
 from models import User
 from auth import decode_access_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
+
+# Seconds a resolved user stays cached; bounds how long a change made by
+# another process (or outside the ORM) can go unnoticed
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_MAX = int(os.getenv("AUTH_CACHE_MAX", "10000"))
+
+# Operator endpoints (model swaps, fleet re-scoring, cache invalidation):
+# the X-Admin-Token header matching ADMIN_TOKEN, or a logged-in user listed
+# in ADMIN_EMAILS.  Denied by default: with neither set, nobody gets in
+# (signup is open, so "logged in" alone proves nothing)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
 
 def get_db():
     db = SessionLocal()
@@ -15,14 +36,135 @@ def get_db():
     finally:
         db.close()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+# ────────────── PRINCIPAL CACHE ──────────────
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as handlers see it: plain values, no session."""
+    id: int
+    email: str
+    created_at: Optional[datetime] = None
+
+class PrincipalCache:
+    """Token subject → Principal with a short TTL, so authenticated requests
+    skip the users query."""
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_entries: int = AUTH_CACHE_MAX):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, subject: str) -> Optional[Principal]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, subject: str, principal: Principal):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[subject] = (principal, time.monotonic() + self.ttl)
+
+    def invalidate(self, subject=None):
+        with self._lock:
+            self.invalidations += 1
+            if subject is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(subject), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "ttl_seconds": self.ttl,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "invalidations": self.invalidations,
+            }
+
+principal_cache = PrincipalCache()
+
+# Any ORM change to a user drops its cached principal: once when the row is
+# flushed and again after the commit, so a request that re-read the old row
+# in between cannot keep it cached
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    principal_cache.invalidate(target.id)
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+@event.listens_for(Session, "after_commit")
+def _users_committed(session):
+    for user_id in session.info.pop("changed_user_ids", ()):
+        principal_cache.invalidate(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _users_rolled_back(session):
+    session.info.pop("changed_user_ids", None)
+
+# ────────────── DEPENDENCIES ──────────────
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     payload = decode_access_token(token)
     if payload is None:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-    user_id = payload.get("sub")
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
+    # A token without a numeric subject is as invalid as a bad signature
+    try:
+        subject = str(int(payload["sub"]))
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    principal = principal_cache.get(subject)
+    if principal is not None:
+        return principal
+
+    # Cache miss: one session for one query, only on this path
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == int(subject)).first()
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal = Principal(id=user.id, email=user.email, created_at=user.created_at)
+    finally:
+        db.close()
+
+    principal_cache.put(subject, principal)
+    return principal
+
+def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[Principal]:
+    # Anonymous callers (e.g. the Streamlit app) are allowed; chats are then
+    # saved without a user_id
+    if not token:
+        return None
+    return get_current_user(token)
 
-    return user
+def require_admin(x_admin_token: Optional[str] = Header(None),
+                  token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[Principal]:
+    if ADMIN_TOKEN and x_admin_token and hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        return None
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated",
+                            headers={"WWW-Authenticate": "Bearer"})
+    principal = get_current_user(token)
+    if principal.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return principal
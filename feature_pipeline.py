@@ -0,0 +1,336 @@
+"""
+feature_pipeline.py
+
+Incremental, vectorized build of `wtg_features` from `dgr_data` + `wtg_model`
+(the importable replacement for feature_engineering.ipynb).
+
+    python feature_pipeline.py                   # nightly: only new dgr_data rows
+    python feature_pipeline.py --since 2025-01-01  # reprocess from a date
+    python feature_pipeline.py --restate-history   # rewrite MTTR/MTBF on every turbine's rows
+    python feature_pipeline.py --dedupe            # notebook table with duplicate keys
+
+• Only dgr_data rows newer than each turbine's last processed date are read,
+  in chunks through a server-side cursor.
+• Time-like columns are converted to hours with vectorized parsing instead
+  of a per-cell Python function.
+• Rows are upserted into wtg_features (unique (turbine_id, log_date)), so the
+  table is never dropped or left empty while the job runs.  If the existing
+  table has duplicate keys the run lists them and stops; --dedupe keeps the
+  last copy of each.
+• Every upserted row gets `updated_at`, which the API's feature store uses
+  to re-read backfilled and restated rows.
+• MTTR/MTBF are the notebook's: each turbine's totals over its whole
+  history (kept in `wtg_reliability_state`), written to all of that
+  turbine's rows.  --running-reliability gives each row the values as of
+  its own date instead; the model was not trained on those, so only use it
+  together with a retrain.  Features, state and MTTR/MTBF for a chunk commit
+  in the same transaction.
+"""
+import argparse
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, inspect, text, types
+
+from db import engine
+
+TIME_COLS = ["operating_hrs", "lull_hrs", "fault_time", "pm_shut_down", "int_grid_down", "ext_grid_down"]
+DOWNTIME_COLS = ["fault_time", "pm_shut_down", "int_grid_down", "ext_grid_down"]
+KEY_COLS = ["turbine_id", "log_date"]
+CHUNK_ROWS = 50_000
+
+log = logging.getLogger("wtg.feature_pipeline")
+
+FLOAT_DTYPES = {c: types.Float for c in ["downtime_hrs", "availability", "plf_percent", "mttr", "mtbf"]}
+TIME_FORMATS = ("%I:%M:%S %p", "%H:%M:%S", "%I:%M %p", "%H:%M")
+
+
+# ─── VECTORIZED TRANSFORMS ─────────────────────────────────────────────────────
+def to_hours(col: pd.Series) -> pd.Series:
+    """
+    Vectorized `to_hours`: numbers pass through, "HH:MM[:SS][ AM/PM]" strings
+    and datetime.time values become fractional hours, anything else → 0.0.
+    """
+    hours = pd.to_numeric(col, errors="coerce").astype(float)
+    todo = hours.isna() & col.notna()
+    if todo.any():
+        txt = col[todo].astype(str).str.strip()
+        for fmt in TIME_FORMATS:
+            parsed = pd.to_datetime(txt, format=fmt, errors="coerce")
+            ok = parsed.notna()
+            if ok.any():
+                p = parsed[ok]
+                hours.loc[p.index] = p.dt.hour + p.dt.minute / 60 + p.dt.second / 3600
+                txt = txt[~ok]
+            if txt.empty:
+                break
+    return hours.fillna(0.0)
+
+
+def build_features(ops: pd.DataFrame, capacity: pd.DataFrame) -> pd.DataFrame:
+    df = ops.merge(capacity, on="turbine_id", how="left")
+    for col in TIME_COLS:
+        df[col] = to_hours(df[col])
+
+    df["downtime_hrs"] = df[DOWNTIME_COLS].sum(axis=1)
+    df["availability"] = df["operating_hrs"] / (df["operating_hrs"] + df["downtime_hrs"]).replace(0, np.nan)
+    df["plf_percent"] = df["gen_units"] / (df["capacity"] * 24.0) * 100
+    return df
+
+
+def apply_running_reliability(df: pd.DataFrame, state: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add mttr/mtbf from running per-turbine totals: prior state + cumulative
+    sums within this chunk (rows must be sorted by turbine_id, log_date).
+    Returns the updated state rows for the turbines in the chunk.
+    """
+    g = df.groupby("turbine_id", sort=False)
+    totals = ["total_operating_hrs", "total_downtime_hrs", "fault_events"]
+    prior = state[totals].reindex(df["turbine_id"]).fillna(0.0).to_numpy(dtype=float)
+
+    total_operating = g["operating_hrs"].cumsum().to_numpy() + prior[:, 0]
+    total_downtime = g["downtime_hrs"].cumsum().to_numpy() + prior[:, 1]
+    fault_events = (df["downtime_hrs"] > 0).groupby(df["turbine_id"], sort=False).cumsum().to_numpy() + prior[:, 2]
+
+    events = np.where(fault_events > 0, fault_events, np.nan)
+    df["mttr"] = total_downtime / events
+    df["mtbf"] = total_operating / events
+
+    last = df.assign(
+        total_operating_hrs=total_operating,
+        total_downtime_hrs=total_downtime,
+        fault_events=fault_events,
+    ).groupby("turbine_id").tail(1)
+    return last.set_index("turbine_id")[
+        ["total_operating_hrs", "total_downtime_hrs", "fault_events", "log_date"]
+    ].rename(columns={"log_date": "last_log_date"})
+
+
+# ─── SCHEMA / STATE ────────────────────────────────────────────────────────────
+def ensure_state_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS wtg_reliability_state (
+            turbine_id TEXT PRIMARY KEY,
+            total_operating_hrs DOUBLE PRECISION NOT NULL,
+            total_downtime_hrs DOUBLE PRECISION NOT NULL,
+            fault_events DOUBLE PRECISION NOT NULL,
+            last_log_date DATE NOT NULL
+        )
+    """))
+
+
+_DUPLICATE_KEYS = """
+    SELECT turbine_id, log_date FROM wtg_features
+    GROUP BY turbine_id, log_date HAVING COUNT(*) > 1
+"""
+
+
+def ensure_features_key(conn, dedupe: bool = False):
+    """
+    Unique (turbine_id, log_date) index for the upsert.  Duplicate keys (a
+    notebook table appended twice) raise with a list of them, or with
+    `dedupe` are cut down to the last copy of each.
+    """
+    if "ux_wtg_features_turbine_date" in {ix["name"] for ix in inspect(conn).get_indexes("wtg_features")}:
+        return
+    dupes = pd.read_sql_query(text(f"""
+        SELECT f.* FROM wtg_features f
+        JOIN ({_DUPLICATE_KEYS}) d ON d.turbine_id = f.turbine_id AND d.log_date = f.log_date
+        ORDER BY f.turbine_id, f.log_date
+    """), conn)
+    if not dupes.empty:
+        keys = dupes.drop_duplicates(subset=KEY_COLS, keep="last")
+        if not dedupe:
+            sample = ", ".join(f"{t} {d}" for t, d in keys[KEY_COLS].head(10).itertuples(index=False))
+            raise RuntimeError(
+                f"wtg_features has {len(keys)} duplicate (turbine_id, log_date) keys "
+                f"({len(dupes)} rows), e.g. {sample}. Remove them or rerun with --dedupe."
+            )
+        conn.execute(text(f"DELETE FROM wtg_features WHERE (turbine_id, log_date) IN ({_DUPLICATE_KEYS})"))
+        keys.to_sql("wtg_features", conn, if_exists="append", index=False)
+        log.info("🧹 Removed %d duplicate rows from 'wtg_features'", len(dupes) - len(keys))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_wtg_features_turbine_date "
+        "ON wtg_features (turbine_id, log_date)"
+    ))
+
+
+def ensure_updated_at(conn):
+    """Add updated_at to a table built before it existed (rows stay NULL until rewritten)."""
+    if "updated_at" not in {c["name"] for c in inspect(conn).get_columns("wtg_features")}:
+        conn.execute(text("ALTER TABLE wtg_features ADD COLUMN updated_at TIMESTAMP"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_wtg_features_updated_at ON wtg_features (updated_at)"))
+
+
+def load_state(conn, since: Optional[str]) -> pd.DataFrame:
+    """
+    Running totals per turbine.  With --since, or on the first run over a
+    table built by the notebook, they are rebuilt from wtg_features itself.
+    """
+    cols = ["turbine_id", "total_operating_hrs", "total_downtime_hrs", "fault_events", "last_log_date"]
+    state = pd.read_sql_query(text(f"SELECT {', '.join(cols)} FROM wtg_reliability_state"), conn)
+    has_features = inspect(conn).has_table("wtg_features")
+
+    if has_features and (since or state.empty):
+        where = "WHERE log_date < :since" if since else ""
+        state = pd.read_sql_query(text(f"""
+            SELECT turbine_id,
+                   SUM(operating_hrs)                             AS total_operating_hrs,
+                   SUM(downtime_hrs)                              AS total_downtime_hrs,
+                   SUM(CASE WHEN downtime_hrs > 0 THEN 1 ELSE 0 END) AS fault_events,
+                   MAX(log_date)                                  AS last_log_date
+            FROM wtg_features
+            {where}
+            GROUP BY turbine_id
+        """), conn, params={"since": since} if since else {})
+        conn.execute(text("DELETE FROM wtg_reliability_state"))
+        if not state.empty:
+            state.to_sql("wtg_reliability_state", conn, if_exists="append", index=False)
+    return state.set_index("turbine_id")
+
+
+def save_state(conn, updates: pd.DataFrame):
+    rows = updates.reset_index().to_dict("records")
+    conn.execute(text("""
+        INSERT INTO wtg_reliability_state
+            (turbine_id, total_operating_hrs, total_downtime_hrs, fault_events, last_log_date)
+        VALUES (:turbine_id, :total_operating_hrs, :total_downtime_hrs, :fault_events, :last_log_date)
+        ON CONFLICT (turbine_id) DO UPDATE SET
+            total_operating_hrs = EXCLUDED.total_operating_hrs,
+            total_downtime_hrs  = EXCLUDED.total_downtime_hrs,
+            fault_events        = EXCLUDED.fault_events,
+            last_log_date       = EXCLUDED.last_log_date
+    """), rows)
+
+
+def upsert_features(conn, df: pd.DataFrame):
+    """Stage the chunk, then INSERT … ON CONFLICT into wtg_features."""
+    if not inspect(conn).has_table("wtg_features"):
+        # First ever run: the chunk defines the table
+        df.to_sql("wtg_features", conn, if_exists="append", index=False, dtype=FLOAT_DTYPES)
+        ensure_features_key(conn)
+        ensure_updated_at(conn)
+        return
+
+    # Own staging table per call: overlapping runs never touch each other's rows
+    staging = f"wtg_features_staging_{uuid.uuid4().hex[:12]}"
+    df.to_sql(staging, conn, index=False, dtype=FLOAT_DTYPES)
+    cols = list(df.columns)
+    col_list = ", ".join(f'"{c}"' for c in cols)
+    updates = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in cols if c not in KEY_COLS)
+    conn.execute(text(f"""
+        INSERT INTO wtg_features ({col_list})
+        SELECT {col_list} FROM {staging}
+        WHERE true  -- lets SQLite parse ON CONFLICT after a SELECT
+        ON CONFLICT (turbine_id, log_date) DO UPDATE SET {updates}
+    """))
+    conn.execute(text(f"DROP TABLE {staging}"))
+
+
+def restate_history(conn, turbine_ids: Optional[list] = None):
+    """Give rows their turbine's current all-history MTTR/MTBF (notebook semantics); all turbines by default."""
+    query = text(f"""
+        UPDATE wtg_features
+        SET mttr = s.total_downtime_hrs  / NULLIF(s.fault_events, 0),
+            mtbf = s.total_operating_hrs / NULLIF(s.fault_events, 0),
+            updated_at = :now
+        FROM wtg_reliability_state s
+        WHERE s.turbine_id = wtg_features.turbine_id
+        {"AND s.turbine_id IN :turbine_ids" if turbine_ids is not None else ""}
+    """)
+    params = {"now": datetime.now(timezone.utc).replace(tzinfo=None)}
+    if turbine_ids is not None:
+        query = query.bindparams(bindparam("turbine_ids", expanding=True))
+        params["turbine_ids"] = list(turbine_ids)
+    conn.execute(query, params)
+
+
+# ─── RUN ───────────────────────────────────────────────────────────────────────
+def run(since: Optional[str] = None, chunk_rows: int = CHUNK_ROWS,
+        restate: bool = False, running: bool = False, dedupe: bool = False) -> dict:
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        ensure_state_table(conn)
+        if inspect(conn).has_table("wtg_features"):
+            ensure_features_key(conn, dedupe)
+            ensure_updated_at(conn)
+        state = load_state(conn, since)
+        capacity = pd.read_sql_query(text("SELECT turbine_id, capacity FROM wtg_model"), conn)
+
+    # Per-turbine watermark, so a crash mid-run never skips or double-counts rows
+    query = text("""
+        SELECT d.* FROM dgr_data d
+        LEFT JOIN wtg_reliability_state s ON s.turbine_id = d.turbine_id
+        WHERE s.last_log_date IS NULL OR d.log_date > s.last_log_date
+        ORDER BY d.turbine_id, d.log_date
+    """)
+
+    n_rows = 0
+    with engine.connect().execution_options(stream_results=True) as read_conn:
+        carry = None
+        for chunk in pd.read_sql_query(query, read_conn, chunksize=chunk_rows):
+            # Keep each turbine's rows in one chunk so cumulative sums line up
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+            if chunk.empty:
+                continue
+            last_tid = chunk["turbine_id"].iloc[-1]
+            tail = chunk["turbine_id"] == last_tid
+            carry, chunk = chunk[tail], chunk[~tail]
+            if not chunk.empty:
+                state = _process_chunk(chunk, capacity, state, running)
+                n_rows += len(chunk)
+        if carry is not None and not carry.empty:
+            state = _process_chunk(carry, capacity, state, running)
+            n_rows += len(carry)
+
+    if restate:
+        with engine.begin() as conn:
+            restate_history(conn)
+
+    return {"rows": n_rows, "seconds": round(time.perf_counter() - t0, 2)}
+
+
+def _process_chunk(ops: pd.DataFrame, capacity: pd.DataFrame, state: pd.DataFrame,
+                   running: bool = False) -> pd.DataFrame:
+    ops = ops.drop_duplicates(subset=KEY_COLS, keep="last").reset_index(drop=True)
+    features = build_features(ops, capacity)
+    updates = apply_running_reliability(features, state)
+    features["updated_at"] = datetime.now(timezone.utc).replace(tzinfo=None)
+    with engine.begin() as conn:
+        upsert_features(conn, features)
+        save_state(conn, updates)
+        if not running:
+            # Each turbine's rows are all in this chunk, so its totals are final here
+            restate_history(conn, list(updates.index))
+    # Later chunks continue from the new totals
+    return pd.concat([state.drop(index=updates.index, errors="ignore"), updates])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally refresh wtg_features from dgr_data")
+    parser.add_argument("--since", help="reprocess dgr_data from this date (YYYY-MM-DD)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--dedupe", action="store_true",
+                        help="keep one row per duplicate (turbine_id, log_date) before adding the unique key")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--restate-history", action="store_true",
+                      help="rewrite MTTR/MTBF on all rows with each turbine's current totals")
+    mode.add_argument("--running-reliability", action="store_true",
+                      help="MTTR/MTBF as of each row's date; the model must be retrained on these")
+    args = parser.parse_args()
+
+    from telemetry import configure_logging
+    configure_logging()
+    if args.running_reliability:
+        print("⚠️ Running MTTR/MTBF differ from what the current model was trained on; retrain before serving")
+    try:
+        result = run(args.since, args.chunk_rows, args.restate_history, args.running_reliability, args.dedupe)
+    except RuntimeError as e:
+        raise SystemExit(f"❌ {e}")
+    print(f"✅ Upserted {result['rows']} rows into 'wtg_features' in {result['seconds']}s")
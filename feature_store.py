@@ -0,0 +1,256 @@
+"""
+feature_store.py
+
+In-memory columnar copy of the model columns of `wtg_features`.
+
+Only the numeric model inputs are loaded (no remarks / nor_1 / nor_2), as
+float32 NumPy arrays grouped per turbine and sorted by date:
+
+    turbine_id → _Series(dates: int32 days since epoch, values: float32 (n, k))
+
+so "latest row for turbine" is an O(1) index and a (turbine_id, log_date)
+lookup is a binary search over at most a few thousand dates.  Memory is
+~4 bytes per feature per row (≈35 MB for 300 turbines × 5 years of daily
+data with 14 features) and can be capped with a retention window.
+
+Refreshes are incremental and swapped in atomically, so readers never
+take a lock.  What gets re-read depends on the table:
+  • with an `updated_at` column (written by feature_pipeline.py): every row
+    changed since the newest updated_at seen, minus a small overlap
+    (FEATURE_STORE_OVERLAP_SECONDS) for late commits, so backfilled
+    turbines and restated old dates come in too;
+  • without it (table built by the notebook): each turbine's distinct-date
+    count and newest date are compared with the store, and turbines that
+    differ are reloaded whole.  In-place edits of existing rows are only
+    picked up with updated_at.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, inspect, text
+
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+FEATURE_STORE_REFRESH_SECONDS = float(os.getenv("FEATURE_STORE_REFRESH_SECONDS", "300"))
+FEATURE_STORE_RETENTION_DAYS = int(os.getenv("FEATURE_STORE_RETENTION_DAYS", "0"))  # 0 → keep all
+FEATURE_STORE_CHUNK_ROWS = int(os.getenv("FEATURE_STORE_CHUNK_ROWS", "50000"))
+FEATURE_STORE_OVERLAP_SECONDS = float(os.getenv("FEATURE_STORE_OVERLAP_SECONDS", "600"))
+
+log = logging.getLogger("wtg.feature_store")
+
+
+class FeatureRow(NamedTuple):
+    turbine_id: str
+    log_date: str          # YYYY-MM-DD
+    values: np.ndarray     # float32, shape (n_features,)
+
+
+class _Series(NamedTuple):
+    dates: np.ndarray      # int32 days since epoch, ascending, unique
+    values: np.ndarray     # float32, shape (len(dates), n_features)
+
+
+def _to_day(d) -> int:
+    return int((np.datetime64(pd.Timestamp(d).date(), "D") - _EPOCH).astype(np.int64))
+
+
+def _from_day(day: int) -> str:
+    return str(_EPOCH + np.timedelta64(int(day), "D"))
+
+
+class FeatureStore:
+    def __init__(self, engine, columns: List[str],
+                 retention_days: int = FEATURE_STORE_RETENTION_DAYS,
+                 chunk_rows: int = FEATURE_STORE_CHUNK_ROWS):
+        self.engine = engine
+        self.columns = list(columns)
+        self.retention_days = retention_days
+        self.chunk_rows = chunk_rows
+
+        self._series: Dict[str, _Series] = {}
+        self._max_day: Optional[int] = None
+        self._watermark: Optional[pd.Timestamp] = None  # newest updated_at loaded
+        self._refresh_lock = threading.Lock()
+        self.last_refresh: Optional[float] = None
+        self.loaded = False
+
+    # ─── LOOKUPS ──────────────────────────────────────────────────────────────
+    def latest(self, turbine_id: str) -> Optional[FeatureRow]:
+        s = self._series.get(turbine_id)
+        if s is None or len(s.dates) == 0:
+            return None
+        return FeatureRow(turbine_id, _from_day(s.dates[-1]), s.values[-1])
+
+    def get(self, turbine_id: str, log_date) -> Optional[FeatureRow]:
+        s = self._series.get(turbine_id)
+        if s is None:
+            return None
+        day = _to_day(log_date)
+        i = int(np.searchsorted(s.dates, day))
+        if i == len(s.dates) or s.dates[i] != day:
+            return None
+        return FeatureRow(turbine_id, _from_day(day), s.values[i])
+
+    def lookup(self, turbine_id: str, log_date=None) -> Optional[FeatureRow]:
+        return self.get(turbine_id, log_date) if log_date else self.latest(turbine_id)
+
+    @property
+    def max_date(self) -> Optional[str]:
+        return _from_day(self._max_day) if self._max_day is not None else None
+
+    # ─── LOADING ──────────────────────────────────────────────────────────────
+    def refresh(self) -> int:
+        """
+        Load everything on the first call, afterwards only what changed
+        (see the module docstring).  Returns the number of rows read.
+        """
+        with self._refresh_lock:
+            has_updated_at = "updated_at" in {
+                c["name"] for c in inspect(self.engine).get_columns("wtg_features")
+            }
+            series = dict(self._series)
+            if self._max_day is None:
+                query, params = self._select(has_updated_at), {}
+            elif has_updated_at:
+                # Rows written without updated_at (the notebook) still come in by date
+                query = self._select(True, "WHERE updated_at >= :since "
+                                           "OR (updated_at IS NULL AND log_date >= :max_date)")
+                since = pd.Timestamp(0) if self._watermark is None else \
+                    self._watermark - pd.Timedelta(seconds=FEATURE_STORE_OVERLAP_SECONDS)
+                params = {"since": since.to_pydatetime(), "max_date": self.max_date}
+            else:
+                changed = self._changed_turbines(series)
+                if not changed:
+                    self.last_refresh = time.time()
+                    return 0
+                for tid in changed:
+                    series.pop(tid, None)  # reloaded whole below
+                query = self._select(has_updated_at, "WHERE turbine_id IN :turbine_ids") \
+                    .bindparams(bindparam("turbine_ids", expanding=True))
+                params = {"turbine_ids": changed}
+
+            n_rows = 0
+            for chunk in pd.read_sql_query(query, self.engine, params=params,
+                                           chunksize=self.chunk_rows):
+                n_rows += len(chunk)
+                self._merge_chunk(series, chunk)
+                if has_updated_at and chunk["updated_at"].notna().any():
+                    newest = pd.to_datetime(chunk["updated_at"]).max()
+                    if self._watermark is None or newest > self._watermark:
+                        self._watermark = newest
+
+            if series:
+                max_day = max(int(s.dates[-1]) for s in series.values() if len(s.dates))
+                if self.retention_days:
+                    cutoff = max_day - self.retention_days
+                    series = {t: self._trim(s, cutoff) for t, s in series.items()}
+                self._max_day = max_day
+
+            # Single reference swap: readers see either the old or the new map
+            self._series = series
+            self.last_refresh = time.time()
+            self.loaded = True
+            return n_rows
+
+    def _select(self, with_updated_at: bool, where: str = ""):
+        extra = ", updated_at" if with_updated_at else ""
+        return text(f"""
+            SELECT turbine_id, log_date{extra}, {", ".join(self.columns)}
+            FROM wtg_features
+            {where}
+            ORDER BY turbine_id, log_date
+        """)
+
+    def _changed_turbines(self, series: Dict[str, _Series]) -> List[str]:
+        """Turbines whose distinct dates in the DB (within retention) differ from the store."""
+        first_day = (self._max_day - self.retention_days + 1) if self.retention_days and self._max_day else None
+        where = "WHERE log_date >= :first_day" if first_day is not None else ""
+        db = pd.read_sql_query(text(f"""
+            SELECT turbine_id, COUNT(*) AS n, MAX(log_date) AS max_date
+            FROM (SELECT DISTINCT turbine_id, log_date FROM wtg_features {where}) d
+            GROUP BY turbine_id
+        """), self.engine, params={"first_day": _from_day(first_day)} if first_day is not None else {})
+        changed = []
+        for tid, n, max_date in db.itertuples(index=False):
+            s = series.get(tid)
+            if s is None or len(s.dates) != n or int(s.dates[-1]) != _to_day(max_date):
+                changed.append(tid)
+        return changed
+
+    def _merge_chunk(self, series: Dict[str, _Series], chunk: pd.DataFrame):
+        days = (pd.to_datetime(chunk["log_date"]).values.astype("datetime64[D]") - _EPOCH).astype(np.int32)
+        values = chunk[self.columns].to_numpy(dtype=np.float32, na_value=np.nan)
+        turbine_ids = chunk["turbine_id"].to_numpy()
+
+        # Rows arrive sorted by turbine, so each turbine is one contiguous slice
+        boundaries = np.flatnonzero(turbine_ids[1:] != turbine_ids[:-1]) + 1
+        for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(chunk)]):
+            tid = turbine_ids[start]
+            new = _Series(days[start:end], values[start:end])
+            old = series.get(tid)
+            series[tid] = new if old is None else self._combine(old, new)
+
+    @staticmethod
+    def _combine(old: _Series, new: _Series) -> _Series:
+        dates = np.concatenate([old.dates, new.dates])
+        values = np.concatenate([old.values, new.values])
+        # Stable sort keeps old before new for equal dates; keep the last one
+        order = np.argsort(dates, kind="stable")
+        dates, values = dates[order], values[order]
+        keep = np.r_[dates[1:] != dates[:-1], True]
+        return _Series(dates[keep], values[keep])
+
+    @staticmethod
+    def _trim(s: _Series, cutoff_day: int) -> _Series:
+        i = int(np.searchsorted(s.dates, cutoff_day, side="right"))
+        return s if i == 0 else _Series(s.dates[i:].copy(), s.values[i:].copy())
+
+    def refresh_async(self):
+        """Start a background refresh unless one is already running."""
+        if self._refresh_lock.locked():
+            return
+        threading.Thread(target=self._safe_refresh, daemon=True).start()
+
+    def _safe_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            log.error("❌ Feature store refresh failed: %s", e)
+
+    def maybe_refresh(self):
+        """Kick a background refresh when the data is older than the TTL."""
+        if self.last_refresh is None or time.time() - self.last_refresh > FEATURE_STORE_REFRESH_SECONDS:
+            self.refresh_async()
+
+    def stats(self) -> dict:
+        series = self._series
+        rows = sum(len(s.dates) for s in series.values())
+        nbytes = sum(s.dates.nbytes + s.values.nbytes for s in series.values())
+        return {
+            "loaded": self.loaded,
+            "turbines": len(series),
+            "rows": rows,
+            "bytes": nbytes,
+            "max_date": self.max_date,
+            "watermark": str(self._watermark) if self._watermark is not None else None,
+            "last_refresh": self.last_refresh,
+        }
+
+
+if __name__ == "__main__":
+    from shap_explainer import engine, feature_cols
+
+    store = FeatureStore(engine, feature_cols)
+    t0 = time.perf_counter()
+    n = store.refresh()
+    print(f"✅ Loaded {n} rows in {time.perf_counter() - t0:.2f}s: {store.stats()}")
+
+    turbine_id = input("Enter Turbine ID (e.g., LH-003): ").strip()
+    t0 = time.perf_counter()
+    row = store.latest(turbine_id)
+    print(f"Latest row ({(time.perf_counter() - t0) * 1e6:.1f} µs):", row)
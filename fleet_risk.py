@@ -0,0 +1,237 @@
+"""
+fleet_risk.py
+
+Precomputed fleet-wide fault risk.
+
+A scoring job (nightly cron, or POST /fleet_risk/refresh) scores every
+turbine in wtg_features for one date, by default the newest one, with the
+active fault model.  It stores probability, top SHAP features and model
+version in `fault_risk_daily`.  site/cluster are copied from wtg_master,
+so GET /fleet_risk ("top 20 in site X") is one index range scan:
+
+    ix_fault_risk_daily_rank     (log_date, fault_probability DESC)
+    ix_fault_risk_daily_site     (log_date, site, fault_probability DESC)
+    ix_fault_risk_daily_cluster  (log_date, cluster, fault_probability DESC)
+
+    python fleet_risk.py                     # newest date in wtg_features
+    python fleet_risk.py --date 2025-03-25
+    python fleet_risk.py --top 10 --site Lahori
+    # crontab: 30 2 * * *  cd /srv/wtg && python fleet_risk.py
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy import inspect, text, types
+
+import telemetry
+from db import engine
+from model_registry import LoadedModel
+from prediction_service import MODEL_PATH, NON_FEATURE_COLS, score
+
+FLEET_TOP_FEATURES = int(os.getenv("FLEET_TOP_FEATURES", "5"))
+FLEET_CHUNK_ROWS   = int(os.getenv("FLEET_CHUNK_ROWS", "5000"))
+DEFAULT_TOP_K      = 20
+RISK_TABLE_RECHECK_SECONDS = 60
+
+
+# ─── SCHEMA ────────────────────────────────────────────────────────────────────
+def ensure_risk_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS fault_risk_daily (
+            log_date DATE NOT NULL,
+            turbine_id TEXT NOT NULL,
+            site TEXT,
+            cluster TEXT,
+            fault_probability DOUBLE PRECISION NOT NULL,
+            top_features TEXT NOT NULL,
+            model_version TEXT,
+            scored_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (log_date, turbine_id)
+        )
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_fault_risk_daily_rank "
+                      "ON fault_risk_daily (log_date, fault_probability DESC)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_fault_risk_daily_site "
+                      "ON fault_risk_daily (log_date, site, fault_probability DESC)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_fault_risk_daily_cluster "
+                      "ON fault_risk_daily (log_date, cluster, fault_probability DESC)"))
+
+
+_risk_table_exists = False
+_risk_table_checked_at = float("-inf")
+
+
+def _has_risk_table() -> bool:
+    # The job usually runs in another process (cron), so "missing" is only
+    # believed for RISK_TABLE_RECHECK_SECONDS; "exists" is kept
+    global _risk_table_exists, _risk_table_checked_at
+    if not _risk_table_exists and time.monotonic() - _risk_table_checked_at >= RISK_TABLE_RECHECK_SECONDS:
+        _risk_table_exists = inspect(engine).has_table("fault_risk_daily")
+        _risk_table_checked_at = time.monotonic()
+    return _risk_table_exists
+
+
+# ─── SCORING JOB ───────────────────────────────────────────────────────────────
+def latest_feature_date():
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT MAX(log_date) FROM wtg_features")).scalar()
+
+
+def fetch_fleet_features(log_date) -> pd.DataFrame:
+    return pd.read_sql_query(text("""
+        SELECT f.*, m.site AS site, m.cluster AS cluster
+        FROM wtg_features f
+        LEFT JOIN wtg_master m ON m.turbine_id = f.turbine_id
+        WHERE f.log_date = :log_date
+        ORDER BY f.turbine_id
+    """), engine, params={"log_date": log_date})
+
+
+def score_rows(model: LoadedModel, df: pd.DataFrame, top_k: int = FLEET_TOP_FEATURES) -> pd.DataFrame:
+    """wtg_features rows (+ site, cluster) → fault_risk_daily rows."""
+    # One (turbine, date) per row even if the table has duplicates
+    df = df.drop_duplicates(subset=["turbine_id", "log_date"]).reset_index(drop=True)
+    non_features = NON_FEATURE_COLS | {"site", "cluster"}
+    X = df[model.feature_names] if model.feature_names else \
+        df.drop(columns=[c for c in non_features if c in df.columns])
+    probs, _, top = score(model, X, top_k=top_k, path="fleet_risk")
+    return pd.DataFrame({
+        "log_date": pd.to_datetime(df["log_date"]).dt.date,
+        "turbine_id": df["turbine_id"],
+        "site": df["site"],
+        "cluster": df["cluster"],
+        "fault_probability": probs.astype(float),
+        "top_features": [json.dumps(t) for t in top],
+        "model_version": model.version,
+        "scored_at": datetime.now(timezone.utc).replace(tzinfo=None),
+    })
+
+
+def upsert_risk(conn, scored: pd.DataFrame):
+    # Staging table per call: concurrent runs (cron + POST /fleet_risk/refresh)
+    # never replace or drop each other's rows
+    staging = f"fault_risk_daily_staging_{uuid.uuid4().hex[:12]}"
+    scored.to_sql(staging, conn, index=False,
+                  dtype={"log_date": types.Date, "scored_at": types.DateTime})
+    conn.execute(text(f"""
+        INSERT INTO fault_risk_daily
+            (log_date, turbine_id, site, cluster, fault_probability, top_features, model_version, scored_at)
+        SELECT log_date, turbine_id, site, cluster, fault_probability, top_features, model_version, scored_at
+        FROM {staging}
+        WHERE true  -- lets SQLite parse ON CONFLICT after a SELECT
+        ON CONFLICT (log_date, turbine_id) DO UPDATE SET
+            site              = EXCLUDED.site,
+            cluster           = EXCLUDED.cluster,
+            fault_probability = EXCLUDED.fault_probability,
+            top_features      = EXCLUDED.top_features,
+            model_version     = EXCLUDED.model_version,
+            scored_at         = EXCLUDED.scored_at
+    """))
+    conn.execute(text(f"DROP TABLE {staging}"))
+
+
+def score_fleet(model: LoadedModel, log_date: Optional[str] = None,
+                chunk_rows: int = FLEET_CHUNK_ROWS) -> dict:
+    """Score every turbine on `log_date` (default: newest date) and upsert the results."""
+    global _risk_table_exists
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        ensure_risk_table(conn)
+    _risk_table_exists = True
+
+    log_date = log_date or latest_feature_date()
+    if log_date is None:
+        return {"log_date": None, "turbines": 0, "seconds": 0.0}
+    log_date = str(pd.to_datetime(log_date).date())
+
+    df = fetch_fleet_features(log_date)
+    with telemetry.span("fleet_scoring"):
+        for start in range(0, len(df), chunk_rows):
+            scored = score_rows(model, df.iloc[start:start + chunk_rows])
+            with engine.begin() as conn:
+                upsert_risk(conn, scored)
+
+    return {
+        "log_date": log_date,
+        "turbines": int(df["turbine_id"].nunique()) if not df.empty else 0,
+        "model_version": model.version,
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+
+
+# ─── QUERIES ───────────────────────────────────────────────────────────────────
+def top_risk(top_k: int = DEFAULT_TOP_K, site: Optional[str] = None, cluster: Optional[str] = None,
+             log_date: Optional[str] = None) -> dict:
+    """
+    Highest-risk turbines for one date (default: the newest scored date),
+    optionally within one site and/or cluster.  Raises LookupError if the
+    job has never run.
+    """
+    if not _has_risk_table():
+        raise LookupError("Fleet risk has not been computed yet; run fleet_risk.py")
+
+    with engine.connect() as conn:
+        if log_date is None:
+            log_date = conn.execute(text("SELECT MAX(log_date) FROM fault_risk_daily")).scalar()
+            if log_date is None:
+                raise LookupError("Fleet risk has not been computed yet; run fleet_risk.py")
+        filters, params = ["log_date = :log_date"], {"log_date": pd.to_datetime(log_date).date(), "k": top_k}
+        if site:
+            filters.append("site = :site")
+            params["site"] = site
+        if cluster:
+            filters.append("cluster = :cluster")
+            params["cluster"] = cluster
+        rows = conn.execute(text(f"""
+            SELECT turbine_id, site, cluster, fault_probability, top_features, model_version, scored_at
+            FROM fault_risk_daily
+            WHERE {" AND ".join(filters)}
+            ORDER BY fault_probability DESC
+            LIMIT :k
+        """), params).fetchall()
+
+    return {
+        "log_date": str(pd.to_datetime(log_date).date()),
+        "count": len(rows),
+        "results": [
+            {
+                "turbine_id": r.turbine_id,
+                "site": r.site,
+                "cluster": r.cluster,
+                "fault_probability": float(r.fault_probability),
+                "explanations": json.loads(r.top_features),
+                "model_version": r.model_version,
+                "scored_at": r.scored_at,
+            }
+            for r in rows
+        ],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fleet-wide fault risk precomputation")
+    parser.add_argument("--date", help="score this date (YYYY-MM-DD); default: newest in wtg_features")
+    parser.add_argument("--top", type=int, help="print the top N instead of scoring")
+    parser.add_argument("--site")
+    parser.add_argument("--cluster")
+    args = parser.parse_args()
+
+    if args.top:
+        for r in top_risk(args.top, args.site, args.cluster, args.date)["results"]:
+            print(f"{r['turbine_id']:<12} {r['site'] or '-':<12} {r['cluster'] or '-':<8} "
+                  f"{r['fault_probability'] * 100:6.2f}%")
+    else:
+        from model_registry import ModelRegistry
+
+        # Same model the API would serve (manifest / newest file in models/)
+        registry = ModelRegistry(MODEL_PATH)
+        registry.check_now()
+        result = score_fleet(registry.current(), args.date)
+        print(f"✅ Scored {result['turbines']} turbines for {result['log_date']} "
+              f"into 'fault_risk_daily' in {result['seconds']}s")
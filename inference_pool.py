@@ -0,0 +1,363 @@
+"""
+inference_pool.py
+
+Worker processes for XGBoost prediction + SHAP contributions.
+
+Native predict/contributions calls and the top-k ranking hold the GIL for
+part of their runtime, so in-process they starve the other request
+threads of the same API worker.  With INFERENCE_POOL_ENABLED the
+prediction service sends them here instead: a pool of spawned processes
+that each load the active model once at start, while the API process only
+does I/O.
+
+    pool = InferencePool(model, workers=4)
+    probs, contribs, top = pool.score(model, X, feature_names, top_k=3)
+    pool.swap_model(new_model)   # registry swap listener
+
+Workers are given the serialized booster (model_registry.model_bytes) and
+its version, never just a path: a file replaced in place must not be scored
+under the old version's label.  swap_model() starts a new set of workers
+with the new model, switches to them once they are warm and lets the old
+ones finish their queue, so no request pays for a load.  A job for a
+version a worker does not hold (e.g. after a pin of an older model) loads
+the file only if its hash still matches; otherwise the worker raises
+ModelUnavailable and the job is resent once with the model's bytes.
+
+The prediction service runs two pools: one for single rows and small
+batches, and a smaller "bulk" pool for matrices above
+INFERENCE_POOL_BULK_ROWS, so a fleet-wide batch never queues interactive
+requests behind it.
+
+Backpressure: at most `max_pending` jobs may be queued or running; beyond
+that score() raises PoolBusy at once (the API answers 503) instead of
+letting latency grow without bound.  Jobs lost to a pool restart also
+raise PoolBusy.  A job not finished within `timeout`
+raises PoolTimeout (504).
+
+A health thread checks every INFERENCE_POOL_HEALTH_SECONDS that the
+workers are alive and answer a ping; a dead worker, a broken pool or a
+stall (jobs pending but none finished for twice the job timeout) restarts
+the pool.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+INFERENCE_POOL_ENABLED        = os.getenv("INFERENCE_POOL_ENABLED", "0") == "1"
+INFERENCE_POOL_WORKERS        = int(os.getenv("INFERENCE_POOL_WORKERS", str(os.cpu_count() or 2)))
+INFERENCE_POOL_MAX_PENDING    = int(os.getenv("INFERENCE_POOL_MAX_PENDING", "0"))  # 0 → 8 per worker
+INFERENCE_POOL_TIMEOUT        = float(os.getenv("INFERENCE_POOL_TIMEOUT", "10"))
+INFERENCE_POOL_THREADS        = int(os.getenv("INFERENCE_POOL_THREADS", "1"))  # XGBoost threads per worker
+INFERENCE_POOL_HEALTH_SECONDS = float(os.getenv("INFERENCE_POOL_HEALTH_SECONDS", "15"))
+INFERENCE_POOL_BULK_ROWS      = int(os.getenv("INFERENCE_POOL_BULK_ROWS", "256"))
+INFERENCE_POOL_BULK_WORKERS   = int(os.getenv("INFERENCE_POOL_BULK_WORKERS",
+                                              str(max(1, INFERENCE_POOL_WORKERS // 2))))
+INFERENCE_POOL_BULK_TIMEOUT   = float(os.getenv("INFERENCE_POOL_BULK_TIMEOUT", "120"))
+
+log = logging.getLogger("wtg.inference_pool")
+
+
+class PoolBusy(RuntimeError):
+    pass
+
+
+class PoolTimeout(TimeoutError):
+    pass
+
+
+class ModelUnavailable(RuntimeError):
+    """Raised in a worker: the requested version is not loaded and its file has changed."""
+
+
+# ─── WORKER PROCESS ────────────────────────────────────────────────────────────
+# Loaded models by version, this process only; the two newest are kept so a
+# model swap doesn't make in-flight jobs reload the old one
+_models: dict = {}
+
+
+def _keep(model):
+    model.booster.set_param({"nthread": INFERENCE_POOL_THREADS})
+    _models[model.version] = model
+    while len(_models) > 2:
+        _models.pop(next(iter(_models)))
+    return model
+
+
+def _model(path: str, version: str, raw: Optional[bytes] = None):
+    from model_registry import load_and_warm, load_bytes_and_warm
+
+    if version in _models:
+        return _models[version]
+    # Workers only run the booster's batch predict/contributions: never compile
+    if raw is not None:
+        return _keep(load_bytes_and_warm(raw, version, path, compile_model=False))
+    model = load_and_warm(path, compile_model=False)
+    if model.version != version:
+        _keep(model)  # most likely the next version: keep it for the jobs that follow
+        raise ModelUnavailable(f"{path} is now version {model.version}, not {version}")
+    return _keep(model)
+
+
+def _init_worker(path: str, version: str, raw: bytes):
+    _model(path, version, raw)
+
+
+def _score(path: str, version: str, X: np.ndarray, feature_names: Optional[list],
+           top_k: Optional[int], raw: Optional[bytes] = None):
+    from native_explainer import predict_with_contributions, top_contributions
+
+    model = _model(path, version, raw)
+    probs, contribs = predict_with_contributions(model.booster, X, feature_names)
+    top = top_contributions(contribs, feature_names or model.feature_names, top_k) if top_k else None
+    return probs, contribs, top
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+# ─── API PROCESS SIDE ──────────────────────────────────────────────────────────
+class InferencePool:
+    def __init__(self, model, workers: int = INFERENCE_POOL_WORKERS,
+                 max_pending: int = INFERENCE_POOL_MAX_PENDING, timeout: float = INFERENCE_POOL_TIMEOUT,
+                 health_seconds: float = INFERENCE_POOL_HEALTH_SECONDS, name: str = "inference"):
+        self.name = name
+        self.model = model  # LoadedModel the workers are started with
+        self.workers = workers
+        self.max_pending = max_pending or workers * 8
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._pending = 0
+        self._jobs = 0
+        self._resent = 0
+        self._swaps = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._errors = 0
+        self._last_progress = time.monotonic()
+        self._restarts = 0
+        self._healthy = True
+        self._last_health: Optional[dict] = None
+        self._executor, self._warming = self._start(model)
+        self.wait_ready()
+
+        self._stop = threading.Event()
+        self._health_thread = None
+        if health_seconds > 0:
+            self._health_thread = threading.Thread(target=self._watch, args=(health_seconds,),
+                                                   name=f"{name}-pool-health", daemon=True)
+            self._health_thread.start()
+
+    def _start(self, model) -> Tuple[ProcessPoolExecutor, list]:
+        from model_registry import model_bytes
+
+        # spawn, not fork: the API process has threads (scheduler, writer, watcher)
+        executor = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"), initializer=_init_worker,
+                                       initargs=(model.path, model.version, model_bytes(model)))
+        # Workers are started on demand; start them all now so each loads the
+        # model before the first request rather than during it
+        warming = [executor.submit(_ping) for _ in range(self.workers)]
+        return executor, warming
+
+    def wait_ready(self, timeout: float = 120.0, warming: Optional[list] = None) -> bool:
+        """Block until every worker has loaded the model; False on timeout or failure."""
+        try:
+            for f in (self._warming if warming is None else warming):
+                f.result(timeout)
+            return True
+        except Exception as e:
+            log.warning("⚠️ %s pool workers not ready: %s", self.name, e)
+            return False
+
+    def restart(self, reason: str):
+        log.warning("🔄 Restarting %s pool: %s", self.name, reason)
+        executor, warming = self._start(self.model)
+        with self._lock:
+            old, self._executor, self._warming = self._executor, executor, warming
+            self._restarts += 1
+            self._last_progress = time.monotonic()
+        # A wedged worker never picks up a shutdown request, so kill them outright
+        processes = list((getattr(old, "_processes", None) or {}).values())
+        old.shutdown(wait=False, cancel_futures=True)
+        for p in processes:
+            p.kill()
+
+    # ─── MODEL SWAP ───────────────────────────────────────────────────────────
+    def swap_model(self, model, wait: bool = False):
+        """
+        Start workers with `model`, switch to them once warm and retire the
+        old ones after their queue.  Runs in the background unless `wait`.
+        """
+        if wait:
+            self._swap(model)
+        else:
+            threading.Thread(target=self._swap, args=(model,), name=f"{self.name}-pool-swap",
+                             daemon=True).start()
+
+    def _swap(self, model):
+        with self._swap_lock:  # one swap at a time; the newest model is started last
+            self.model = model
+            executor, warming = self._start(model)
+            if not self.wait_ready(warming=warming):
+                # Keep the old workers; jobs for `model` reach them with its bytes
+                executor.shutdown(wait=False, cancel_futures=True)
+                return
+            with self._lock:
+                old, self._executor, self._warming = self._executor, executor, warming
+                self._swaps += 1
+            old.shutdown(wait=False)
+            log.info("🔄 %s pool workers now serve model %s", self.name, model.version)
+
+    # ─── JOBS ─────────────────────────────────────────────────────────────────
+    def score(self, model, X, feature_names: Optional[Sequence[str]] = None,
+              top_k: Optional[int] = None, timeout: Optional[float] = None):
+        """
+        (probs, contribs, top) for X scored with `model` (a LoadedModel) in a
+        worker.  `top` is top_contributions(..., top_k), or None without top_k.
+        """
+        if feature_names is None and hasattr(X, "columns"):
+            feature_names = list(X.columns)
+        X = np.asarray(X, dtype=np.float32)
+        names = list(feature_names) if feature_names is not None else None
+
+        try:
+            return self._run(timeout, _score, model.path, model.version, X, names, top_k)
+        except ModelUnavailable:
+            # This worker never held `model` and the file has moved on: send the model itself
+            from model_registry import model_bytes
+
+            with self._lock:
+                self._resent += 1
+            return self._run(timeout, _score, model.path, model.version, X, names, top_k, model_bytes(model))
+
+    def _run(self, timeout: Optional[float], fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise PoolBusy(f"{self.name} pool is full ({self.max_pending} jobs pending)")
+            self._pending += 1
+            if self._pending == 1:
+                self._last_progress = time.monotonic()  # idle → busy: the stall clock starts now
+            self._jobs += 1
+        try:
+            future = self._submit(fn, *args)
+        except RuntimeError as e:  # BrokenProcessPool, or an executor shut down by close()
+            with self._lock:
+                self._pending -= 1
+            if isinstance(e, BrokenProcessPool):
+                self.restart("broken pool on submit")
+            raise PoolBusy(f"{self.name} pool is restarting") from e
+        future.add_done_callback(self._done)
+
+        try:
+            return future.result(timeout or self.timeout)
+        except FuturesTimeout:
+            future.cancel()
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f"{self.name} job took longer than {timeout or self.timeout}s")
+        except BrokenProcessPool as e:
+            with self._lock:
+                self._errors += 1
+            self.restart("worker died")
+            raise PoolBusy(f"{self.name} pool is restarting") from e
+        except CancelledError as e:
+            # Queued behind a job when the pool was restarted
+            raise PoolBusy(f"{self.name} pool is restarting") from e
+
+    def _submit(self, fn, *args):
+        executor = self._executor
+        try:
+            return executor.submit(fn, *args)
+        except RuntimeError:
+            # Shut down by a model swap between reading and submitting: use its successor
+            if executor is self._executor:
+                raise
+            return self._executor.submit(fn, *args)
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if not future.cancelled():
+                self._last_progress = time.monotonic()
+
+    # ─── HEALTH ───────────────────────────────────────────────────────────────
+    def check_health(self, timeout: float = 5.0) -> dict:
+        """Workers alive and answering a ping; restarts the pool if not."""
+        executor = self._executor
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        dead = sum(not p.is_alive() for p in processes)
+        ping_ms, error, busy = None, None, False
+        t0 = time.perf_counter()
+        try:
+            executor.submit(_ping).result(timeout)
+            ping_ms = (time.perf_counter() - t0) * 1000.0
+        except FuturesTimeout:
+            # Every worker busy is not a failure by itself; a stall is
+            error, busy = "ping timed out (workers busy)", True
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+        stalled_s = time.monotonic() - self._last_progress
+        if busy and self.pending() > 0 and stalled_s > 2 * self.timeout:
+            error, busy = f"no job finished for {stalled_s:.0f}s", False
+
+        healthy = dead == 0 and (error is None or busy)
+        health = {"healthy": healthy, "processes": len(processes), "dead": dead,
+                  "ping_ms": ping_ms, "error": error, "checked_at": time.time()}
+        if not healthy:
+            self.restart(error or f"{dead} dead worker(s)")
+            health["restarted"] = True
+            healthy = health["healthy"] = self.wait_ready()
+        with self._lock:
+            self._healthy, self._last_health = healthy, health
+        return health
+
+    def _watch(self, every: float):
+        while not self._stop.wait(every):
+            try:
+                self.check_health()
+            except Exception as e:
+                log.warning("⚠️ %s pool health check failed: %s", self.name, e)
+
+    @property
+    def healthy(self) -> bool:
+        return self._healthy
+
+    def close(self):
+        self._stop.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    # ─── STATS ────────────────────────────────────────────────────────────────
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "timeout_s": self.timeout,
+                "model_version": self.model.version,
+                "jobs": self._jobs,
+                "resent": self._resent,
+                "swaps": self._swaps,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "errors": self._errors,
+                "restarts": self._restarts,
+                "healthy": self._healthy,
+                "last_health": self._last_health,
+            }
@@ -0,0 +1,170 @@
+"""
+inference_scheduler.py
+
+Micro-batching in front of the fault model.
+
+Single-row requests (from /predict_fault and /ask) are queued; one worker
+thread takes the first waiting request, keeps collecting for up to
+`window_ms` or until `max_batch` rows are waiting, then scores them all
+with a single native predict + contributions call and resolves each
+caller's future with its own row and the version of the model that
+scored it.
+
+    scheduler = InferenceScheduler(booster, window_ms=3, max_batch=64, version="ab12…")
+    prob, contribs, version = scheduler.predict(x_row, feature_names)
+
+`stats()` reports queue depth, the batch-size distribution and per-request
+wait time (submit → batch start), to tune window_ms against throughput.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import xgboost as xgb
+
+from native_explainer import predict_with_contributions
+from telemetry import observe_inference
+
+# Upper edges of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+_STOP = object()
+
+
+class _Request:
+    __slots__ = ("row", "feature_names", "future", "submitted_at")
+
+    def __init__(self, row: np.ndarray, feature_names: Tuple[str, ...]):
+        self.row = row
+        self.feature_names = feature_names
+        self.future: Future = Future()
+        self.submitted_at = time.perf_counter()
+
+
+class InferenceScheduler:
+    def __init__(self, booster: xgb.Booster, window_ms: float = 3.0, max_batch: int = 64,
+                 wait_samples: int = 2000, version: Optional[str] = None):
+        # (booster, version), replaced as one object by set_model; the worker
+        # reads it once per batch
+        self._model = (booster, version)
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._errors = 0
+        self._batch_hist = {b: 0 for b in BATCH_SIZE_BUCKETS}
+        self._batch_hist["inf"] = 0
+        self._waits = deque(maxlen=wait_samples)
+
+        self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._thread.start()
+
+    def set_model(self, booster: xgb.Booster, version: Optional[str] = None):
+        self._model = (booster, version)
+
+    # ─── CALLER SIDE ──────────────────────────────────────────────────────────
+    def submit(self, row: np.ndarray, feature_names: Sequence[str]) -> Future:
+        """Queue one feature vector; the future resolves to (probability, contributions, version)."""
+        req = _Request(np.asarray(row, dtype=np.float32).ravel(), tuple(feature_names))
+        self._queue.put(req)
+        return req.future
+
+    def predict(self, row: np.ndarray, feature_names: Sequence[str],
+                timeout: Optional[float] = None) -> Tuple[float, np.ndarray, Optional[str]]:
+        return self.submit(row, feature_names).result(timeout)
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+
+    # ─── WORKER ───────────────────────────────────────────────────────────────
+    def _collect(self) -> Optional[List[_Request]]:
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)  # finish this batch, stop on the next loop
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            self._record(batch, started)
+
+            # Store rows and DB rows can differ in column order, so score per layout
+            groups = {}
+            for req in batch:
+                groups.setdefault(req.feature_names, []).append(req)
+
+            booster, version = self._model
+            for names, reqs in groups.items():
+                try:
+                    X = np.vstack([r.row for r in reqs])
+                    t0 = time.perf_counter()
+                    probs, contribs = predict_with_contributions(booster, X, list(names))
+                    observe_inference("batched", time.perf_counter() - t0, len(reqs))
+                except Exception as e:
+                    with self._lock:
+                        self._errors += len(reqs)
+                    for r in reqs:
+                        r.future.set_exception(e)
+                    continue
+                for i, r in enumerate(reqs):
+                    r.future.set_result((float(probs[i]), contribs[i], version))
+
+    def _record(self, batch: List[_Request], started: float):
+        size = len(batch)
+        bucket = next((b for b in BATCH_SIZE_BUCKETS if size <= b), "inf")
+        with self._lock:
+            self._requests += size
+            self._batches += 1
+            self._batch_hist[bucket] += 1
+            self._waits.extend(started - r.submitted_at for r in batch)
+
+    # ─── STATS ────────────────────────────────────────────────────────────────
+    def stats(self) -> dict:
+        with self._lock:
+            waits_ms = np.array(self._waits) * 1000.0
+            s = {
+                "window_ms": self.window * 1000.0,
+                "max_batch": self.max_batch,
+                "queue_depth": self._queue.qsize(),
+                "requests": self._requests,
+                "batches": self._batches,
+                "errors": self._errors,
+                "avg_batch_size": self._requests / self._batches if self._batches else None,
+                "batch_size_histogram": {f"<={k}" if k != "inf" else f">{BATCH_SIZE_BUCKETS[-1]}": v
+                                         for k, v in self._batch_hist.items()},
+            }
+        if waits_ms.size:
+            s["wait_ms"] = {
+                "avg": float(waits_ms.mean()),
+                "p50": float(np.percentile(waits_ms, 50)),
+                "p95": float(np.percentile(waits_ms, 95)),
+                "p99": float(np.percentile(waits_ms, 99)),
+                "max": float(waits_ms.max()),
+            }
+        else:
+            s["wait_ms"] = None
+        return s
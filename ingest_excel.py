@@ -0,0 +1,256 @@
+"""
+ingest_excel.py
+
+Bulk loader for the yearly DGR / DLB workbooks (the command-line replacement
+for load_excel_to_postgres.ipynb).
+
+    python ingest_excel.py final_final_dataset.xlsx --dlb DLB_2024.xlsx --workers 4 --report ingest.json
+
+• Sheets are read row-by-row with openpyxl's read-only mode and handled in
+  chunks, so a whole sheet is never held in memory.
+• Each chunk is cleaned column-wise: "\\N" cells, the bool_cols_map columns,
+  numeric/date columns coerced to the target table's types, and alarm_code
+  checked against alarm_desc.
+• Rows go into Postgres with COPY … FROM STDIN (CSV) instead of to_sql INSERTs.
+• Independent sheets load in parallel worker processes, in dependency
+  waves (wtg_master / alarm_desc before the tables that reference them).
+• The report lists rows/second for every table.
+"""
+import argparse
+import io
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy import inspect, text
+from sqlalchemy.types import Boolean, Date, DateTime, Float, Integer, Numeric
+
+import db
+
+# Sheet → Table mapping
+SHEET_TABLE_MAP = {
+    'WTG_Master': 'wtg_master',
+    'WTG_Model': 'wtg_model',
+    'WTG_STATUS': 'wtg_status',
+    'Status_log': 'wtg_status_log',
+    'Service_Report_Material_Consump': 'service_report_material_consumption',
+    'Maintainence_schedule': 'maintenance_schedule',
+    'User': 'users',
+    'parameter_threshold': 'parameter_threshold',
+    'Alarm_Desc': 'alarm_desc',
+    'Alarm_Info': 'alarm_info',
+    'DGR_Data': 'dgr_data'
+}
+
+# Boolean columns to convert (0/1 → True/False)
+BOOL_COLS_MAP = {
+    'wtg_status': ['is_resettable', 'is_auto_reset'],
+    'wtg_status_log': ['is_remote_resettable', 'is_remote_resetted', 'is_auto_reset', 'is_ack'],
+    'maintenance_schedule': ['is_measurement_log_filled']
+}
+
+# Tables whose alarm_code must exist in alarm_desc
+ALARM_FK_TABLES = {'alarm_info', 'dlb'}
+
+# Load order: every table in a wave only references tables of earlier waves
+FIRST_WAVE = {'wtg_master', 'alarm_desc', 'users', 'parameter_threshold'}
+
+DLB_SHEET = ('DLB', 'dlb')
+CHUNK_ROWS = 20_000
+NULL_MARKER = "\\N"
+TRUTHY = {"true", "t", "yes", "y"}
+
+
+# ─── WORKER SIDE ───────────────────────────────────────────────────────────────
+def _init_worker():
+    # Never reuse connections inherited from the parent process
+    db.engine.dispose(close=False)
+
+
+def iter_sheet_chunks(path: str, sheet: str, chunk_rows: int = CHUNK_ROWS):
+    """Stream a sheet as DataFrames of at most chunk_rows rows."""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb[sheet].iter_rows(values_only=True)
+        header = [str(c).strip() if c is not None else "" for c in next(rows, [])]
+        batch = []
+        for row in rows:
+            if row is None or all(v is None for v in row):
+                continue
+            batch.append(row[:len(header)])
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        wb.close()
+
+
+def clean_chunk(df: pd.DataFrame, table: str, column_types: Dict[str, str],
+                valid_alarm_codes: Optional[set]) -> Tuple[pd.DataFrame, dict]:
+    """Vectorized cleaning; returns the chunk and per-chunk validation counts."""
+    issues = {"invalid_values": 0, "rejected_rows": 0}
+
+    # Keep only columns that exist in the target table
+    df = df[[c for c in df.columns if c in column_types]].copy()
+
+    # "\N" cells are NULLs in the source exports
+    obj_cols = df.select_dtypes(include="object").columns
+    if len(obj_cols):
+        df[obj_cols] = df[obj_cols].mask(df[obj_cols].eq(NULL_MARKER))
+
+    bool_cols = set(BOOL_COLS_MAP.get(table, [])) | {c for c, t in column_types.items() if t == "bool"}
+    for col in df.columns:
+        kind = column_types[col]
+        s = df[col]
+        if col in bool_cols:
+            num = pd.to_numeric(s, errors="coerce")
+            df[col] = num.fillna(0).ne(0) | s.astype(str).str.strip().str.lower().isin(TRUTHY)
+        elif kind == "int" or kind == "float":
+            num = pd.to_numeric(s, errors="coerce")
+            issues["invalid_values"] += int((num.isna() & s.notna()).sum())
+            df[col] = num.astype("Int64") if kind == "int" and (num.dropna() % 1 == 0).all() else num
+        elif kind in ("date", "datetime"):
+            dt = pd.to_datetime(s, errors="coerce")
+            issues["invalid_values"] += int((dt.isna() & s.notna()).sum())
+            df[col] = dt.dt.date if kind == "date" else dt
+
+    if table in ALARM_FK_TABLES and "alarm_code" in df.columns and valid_alarm_codes is not None:
+        codes = df["alarm_code"].astype(str).str.strip().str.replace(r"\.0$", "", regex=True)
+        keep = codes.isin(valid_alarm_codes)
+        issues["rejected_rows"] += int((~keep).sum())
+        df = df.loc[keep].assign(alarm_code=codes[keep])
+
+    return df, issues
+
+
+def copy_chunk(raw_conn, table: str, df: pd.DataFrame):
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False, na_rep=NULL_MARKER)
+    buf.seek(0)
+    cols = ", ".join(f'"{c}"' for c in df.columns)
+    with raw_conn.cursor() as cur:
+        cur.copy_expert(
+            f"COPY {table} ({cols}) FROM STDIN WITH (FORMAT csv, NULL '{NULL_MARKER}')", buf
+        )
+
+
+def load_sheet(path: str, sheet: str, table: str, column_types: Dict[str, str],
+               chunk_rows: int = CHUNK_ROWS) -> dict:
+    """Stream one sheet into one table with COPY; one transaction per sheet."""
+    t0 = time.perf_counter()
+    stats = {"sheet": sheet, "table": table, "rows_read": 0, "rows_loaded": 0,
+             "invalid_values": 0, "rejected_rows": 0}
+
+    valid_alarm_codes = None
+    if table in ALARM_FK_TABLES:
+        with db.engine.connect() as conn:
+            codes = conn.execute(text("SELECT alarm_code FROM alarm_desc")).scalars()
+            valid_alarm_codes = {str(c).strip() for c in codes}
+
+    raw_conn = db.engine.raw_connection()
+    try:
+        for chunk in iter_sheet_chunks(path, sheet, chunk_rows):
+            stats["rows_read"] += len(chunk)
+            chunk, issues = clean_chunk(chunk, table, column_types, valid_alarm_codes)
+            for k, v in issues.items():
+                stats[k] += v
+            if not chunk.empty:
+                copy_chunk(raw_conn, table, chunk)
+                stats["rows_loaded"] += len(chunk)
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    stats["rows_per_second"] = round(stats["rows_loaded"] / stats["seconds"], 1) if stats["seconds"] else None
+    return stats
+
+
+# ─── PARENT SIDE ───────────────────────────────────────────────────────────────
+def _kind(sa_type) -> str:
+    if isinstance(sa_type, Boolean):
+        return "bool"
+    if isinstance(sa_type, Integer):
+        return "int"
+    if isinstance(sa_type, (Float, Numeric)):
+        return "float"
+    if isinstance(sa_type, DateTime):
+        return "datetime"
+    if isinstance(sa_type, Date):
+        return "date"
+    return "other"
+
+
+def table_column_types(tables: List[str]) -> Dict[str, Dict[str, str]]:
+    insp = inspect(db.engine)
+    return {t: {c["name"].strip(): _kind(c["type"]) for c in insp.get_columns(t)} for t in tables}
+
+
+def run(workbook: Optional[str], dlb: Optional[str] = None, workers: int = 4,
+        chunk_rows: int = CHUNK_ROWS) -> List[dict]:
+    jobs = []  # (path, sheet, table)
+    if workbook:
+        jobs += [(workbook, sheet, table) for sheet, table in SHEET_TABLE_MAP.items()]
+    if dlb:
+        jobs.append((dlb, *DLB_SHEET))
+
+    column_types = table_column_types([table for _, _, table in jobs])
+    waves = [
+        [j for j in jobs if j[2] in FIRST_WAVE],
+        [j for j in jobs if j[2] not in FIRST_WAVE],
+    ]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for wave in waves:
+            futures = {
+                pool.submit(load_sheet, path, sheet, table, column_types[table], chunk_rows): table
+                for path, sheet, table in wave
+            }
+            for fut in as_completed(futures):
+                stats = fut.result()
+                results.append(stats)
+                print(f"✅ Loaded '{stats['sheet']}' into '{stats['table']}': "
+                      f"{stats['rows_loaded']} rows in {stats['seconds']}s "
+                      f"({stats['rows_per_second']} rows/s, {stats['rejected_rows']} rejected)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream Excel workbooks into Postgres with COPY")
+    parser.add_argument("workbook", nargs="?", help="main workbook (e.g. final_final_dataset.xlsx)")
+    parser.add_argument("--dlb", help="DLB workbook (e.g. DLB_2024.xlsx)")
+    parser.add_argument("--workers", type=int, default=4, help="parallel sheet loaders")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--report", help="write the per-table benchmark as JSON to this file")
+    args = parser.parse_args()
+    if not args.workbook and not args.dlb:
+        parser.error("give a workbook and/or --dlb")
+
+    t0 = time.perf_counter()
+    results = run(args.workbook, args.dlb, args.workers, args.chunk_rows)
+    total_rows = sum(r["rows_loaded"] for r in results)
+    elapsed = time.perf_counter() - t0
+    report = {
+        "tables": sorted(results, key=lambda r: r["table"]),
+        "total_rows": total_rows,
+        "total_seconds": round(elapsed, 3),
+        "total_rows_per_second": round(total_rows / elapsed, 1) if elapsed else None,
+    }
+
+    print(f"\n{'table':40s} {'rows':>10s} {'seconds':>9s} {'rows/s':>10s}")
+    for r in report["tables"]:
+        print(f"{r['table']:40s} {r['rows_loaded']:>10d} {r['seconds']:>9.2f} {r['rows_per_second'] or 0:>10.1f}")
+    print(f"{'TOTAL':40s} {total_rows:>10d} {elapsed:>9.2f} {report['total_rows_per_second'] or 0:>10.1f}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2, default=str)
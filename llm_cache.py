@@ -0,0 +1,220 @@
+"""
+llm_cache.py
+
+Two-tier cache for OpenRouter/DeepSeek completions.
+
+    key   = sha256(model ID + context version + normalized messages [+ extra])
+    tier1 = in-process LRU (OrderedDict), LLM_CACHE_MEMORY_ENTRIES entries
+    tier2 = SQLite file shared by all workers on the box, LLM_CACHE_DISK_ENTRIES
+
+Entries expire after LLM_CACHE_TTL seconds and carry an optional tag
+(e.g. "LH-003:2025-03-25") so answers about one turbine/date can be
+invalidated when its features change.  `context_version` is mixed into
+every key; prediction_service sets it to the fault-model fingerprint, so
+loading a different model file makes every older answer unreachable.
+
+Coroutines use `aget`/`aset`: memory hits are answered inline, the SQLite
+tier runs in a worker thread so a slow disk never blocks the event loop.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+LLM_CACHE_ENABLED        = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_PATH           = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_TTL            = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1000"))
+LLM_CACHE_DISK_ENTRIES   = int(os.getenv("LLM_CACHE_DISK_ENTRIES", "50000"))
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize(text: str, casefold: bool = False) -> str:
+    text = _WS_RE.sub(" ", text).strip()
+    return text.casefold() if casefold else text
+
+
+class LLMCache:
+    def __init__(self, path: Optional[str] = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL,
+                 memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+                 disk_entries: int = LLM_CACHE_DISK_ENTRIES):
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.context_version = ""
+
+        self._lock = threading.Lock()     # memory tier + stats
+        self._db_lock = threading.Lock()  # SQLite tier
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key → (value, tag, expires_at)
+        self._writes_since_prune = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                       "sets": 0, "evictions": 0, "invalidations": 0}
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    tag TEXT,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_tag ON llm_cache (tag)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_access ON llm_cache (last_access)")
+
+    # ─── KEYS ─────────────────────────────────────────────────────────────────
+    def make_key(self, model: str, messages: List[dict], extra: str = "",
+                 casefold: bool = False) -> str:
+        norm = [{"role": m["role"], "content": normalize(m["content"], casefold)} for m in messages]
+        raw = json.dumps([model, self.context_version, norm, extra], sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ─── GET / SET ────────────────────────────────────────────────────────────
+    def get(self, key: str) -> Optional[str]:
+        value = self._get_memory(key)
+        return value if value is not None else self._get_disk(key)
+
+    def set(self, key: str, value: str, tag: Optional[str] = None):
+        expires_at = self._set_memory(key, value, tag)
+        self._set_disk(key, value, tag, expires_at)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() for coroutines: the SQLite lookup runs in a worker thread."""
+        value = self._get_memory(key)
+        if value is not None or self._db is None:
+            return value if value is not None else self._get_disk(key)
+        return await asyncio.to_thread(self._get_disk, key)
+
+    async def aset(self, key: str, value: str, tag: Optional[str] = None):
+        """set() for coroutines: the SQLite write runs in a worker thread."""
+        expires_at = self._set_memory(key, value, tag)
+        if self._db is not None:
+            await asyncio.to_thread(self._set_disk, key, value, tag, expires_at)
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, tag, expires_at = entry
+            if expires_at > time.time():
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return value
+            del self._memory[key]
+            return None
+
+    def _get_disk(self, key: str) -> Optional[str]:
+        """Second tier; counts the miss when there is no disk tier or no live row."""
+        row = None
+        if self._db is not None:
+            now = time.time()
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, tag, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[2] > now:
+                    self._db.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                else:
+                    row = None
+        with self._lock:
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._remember(key, row[0], row[1], row[2])
+            self._stats["disk_hits"] += 1
+            return row[0]
+
+    def _set_memory(self, key: str, value: str, tag: Optional[str]) -> float:
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, tag, expires_at)
+            self._stats["sets"] += 1
+        return expires_at
+
+    def _set_disk(self, key: str, value: str, tag: Optional[str], expires_at: float):
+        if self._db is None:
+            return
+        now = time.time()
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, tag, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, tag, expires_at, now),
+            )
+            self._writes_since_prune += 1
+            if self._writes_since_prune >= 100:
+                self._prune_disk(now)
+
+    def _remember(self, key, value, tag, expires_at):
+        self._memory[key] = (value, tag, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _prune_disk(self, now: float):
+        self._writes_since_prune = 0
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        # Least-recently-used rows beyond the size bound
+        cur = self._db.execute("""
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.disk_entries,))
+        with self._lock:
+            self._stats["evictions"] += max(cur.rowcount, 0)
+
+    # ─── INVALIDATION ─────────────────────────────────────────────────────────
+    def invalidate(self, tag: Optional[str] = None) -> int:
+        """Drop entries with this tag or tag prefix ("LH-003:"); everything if None."""
+        with self._lock:
+            if tag is None:
+                removed = len(self._memory)
+                self._memory.clear()
+            else:
+                keys = [k for k, (_, t, _) in self._memory.items() if t and t.startswith(tag)]
+                for k in keys:
+                    del self._memory[k]
+                removed = len(keys)
+            self._stats["invalidations"] += 1
+        if self._db is not None:
+            with self._db_lock:
+                if tag is None:
+                    cur = self._db.execute("DELETE FROM llm_cache")
+                else:
+                    cur = self._db.execute(
+                        "DELETE FROM llm_cache WHERE substr(tag, 1, ?) = ?", (len(tag), tag)
+                    )
+            removed = max(removed, cur.rowcount)
+        return removed
+
+    def set_context_version(self, version: str):
+        self.context_version = version or ""
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["memory_entries"] = len(self._memory)
+        if self._db is not None:
+            with self._db_lock:
+                s["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = s["memory_hits"] + s["disk_hits"] + s["misses"]
+        s["hit_rate"] = (s["memory_hits"] + s["disk_hits"]) / lookups if lookups else None
+        s["context_version"] = self.context_version
+        return s
+
+
+cache = LLMCache() if LLM_CACHE_ENABLED else None
@@ -0,0 +1,236 @@
+"""
+model_registry.py
+
+Hot-reloadable fault model.
+
+The registry serves one active booster and watches for a new one:
+  • a manifest (models/manifest.json: {"active": "xgb_fault_classifier_v2.json"})
+    when present, otherwise
+  • the newest file matching MODEL_REGISTRY_GLOB in the models directory.
+
+A new file is loaded on the watcher thread, warmed with a synthetic
+predict + contributions call, and only then swapped in (a single attribute
+assignment), so requests never wait on a load or hit a cold model.  The
+previous versions stay in memory for rollback; `pin()` freezes the active
+version until `unpin()`.
+
+Versions are the first 12 hex digits of the file's sha256.
+
+With COMPILED_MODEL_ENABLED each version is also flattened into a
+compiled_model.CompiledModel at load time (probability-only fast path);
+models it cannot represent keep `compiled = None`.  Callers that only
+use the booster (inference_pool workers) pass compile_model=False.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+import xgboost as xgb
+
+from compiled_model import compile_booster
+from native_explainer import predict_with_contributions
+
+MODEL_REGISTRY_POLL_SECONDS = float(os.getenv("MODEL_REGISTRY_POLL_SECONDS", "30"))
+MODEL_REGISTRY_GLOB         = os.getenv("MODEL_REGISTRY_GLOB", "*.json")
+MODEL_REGISTRY_MANIFEST     = os.getenv("MODEL_REGISTRY_MANIFEST", "manifest.json")
+MODEL_REGISTRY_KEEP         = int(os.getenv("MODEL_REGISTRY_KEEP", "3"))
+COMPILED_MODEL_ENABLED      = os.getenv("COMPILED_MODEL_ENABLED", "1") == "1"
+
+log = logging.getLogger("wtg.model_registry")
+
+
+def file_version(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+class LoadedModel:
+    """An immutable (booster, version) pair; swapped as a whole."""
+    __slots__ = ("booster", "version", "path", "loaded_at", "feature_names", "compiled")
+
+    def __init__(self, booster: xgb.Booster, version: str, path: str):
+        self.booster = booster
+        self.version = version
+        self.path = path
+        self.loaded_at = time.time()
+        self.feature_names = list(booster.feature_names or [])
+        self.compiled = None
+
+    def info(self) -> dict:
+        return {"version": self.version, "path": self.path, "loaded_at": self.loaded_at,
+                "num_features": self.booster.num_features(), "compiled": self.compiled is not None}
+
+
+def load_and_warm(path: str, compile_model: bool = COMPILED_MODEL_ENABLED) -> LoadedModel:
+    booster = xgb.Booster()
+    booster.load_model(path)
+    return _warm(LoadedModel(booster, file_version(path), path), compile_model)
+
+
+def model_bytes(model: LoadedModel) -> bytes:
+    """The in-memory booster serialized, independent of what is now at model.path."""
+    return bytes(model.booster.save_raw("ubj"))
+
+
+def load_bytes_and_warm(raw: bytes, version: str, path: str,
+                        compile_model: bool = COMPILED_MODEL_ENABLED) -> LoadedModel:
+    """Inverse of model_bytes(); `version` is the label of the model they came from."""
+    booster = xgb.Booster()
+    booster.load_model(bytearray(raw))
+    return _warm(LoadedModel(booster, version, path), compile_model)
+
+
+def _warm(model: LoadedModel, compile_model: bool) -> LoadedModel:
+    booster = model.booster
+    # One synthetic row through the exact serving call, so the first real
+    # request doesn't pay for lazy initialisation
+    n = booster.num_features()
+    predict_with_contributions(booster, np.zeros((1, n), dtype=np.float32), model.feature_names or None)
+
+    if compile_model:
+        try:
+            model.compiled = compile_booster(booster)
+            model.compiled.predict_proba_row(np.zeros(n, dtype=np.float32))
+        except ValueError as e:
+            log.warning("⚠️ Model %s not compiled, using Booster.predict: %s", model.version, e)
+    return model
+
+
+class ModelRegistry:
+    def __init__(self, initial_path: str, models_dir: Optional[str] = None,
+                 poll_seconds: float = MODEL_REGISTRY_POLL_SECONDS):
+        self.models_dir = models_dir or os.path.dirname(initial_path) or "."
+        self.poll_seconds = poll_seconds
+        self.pinned = False
+        self.last_error: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[LoadedModel, Optional[LoadedModel]], None]] = []
+        self._history: "OrderedDict[str, LoadedModel]" = OrderedDict()
+        self._seen_mtime: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._active = load_and_warm(initial_path)
+        self._history[self._active.version] = self._active
+        self._seen_mtime = os.path.getmtime(initial_path)
+
+    # ─── ACTIVE MODEL ─────────────────────────────────────────────────────────
+    def current(self) -> LoadedModel:
+        return self._active
+
+    def on_swap(self, listener: Callable[[LoadedModel, Optional[LoadedModel]], None]):
+        """listener(new, old) runs after every swap (on the swapping thread)."""
+        self._listeners.append(listener)
+
+    def _swap(self, model: LoadedModel):
+        with self._lock:
+            old = self._active
+            if old.version == model.version:
+                return
+            self._active = model
+            self._history[model.version] = model
+            self._history.move_to_end(model.version)
+            while len(self._history) > MODEL_REGISTRY_KEEP:
+                oldest = next(iter(self._history))
+                if oldest == model.version:
+                    break
+                self._history.pop(oldest)
+        log.info("🔄 Fault model %s → %s (%s)", old.version, model.version, model.path)
+        for listener in self._listeners:
+            try:
+                listener(model, old)
+            except Exception as e:
+                log.warning("⚠️ Model swap listener failed: %s", e)
+
+    # ─── DISCOVERY ────────────────────────────────────────────────────────────
+    def candidate_path(self) -> Optional[str]:
+        """Model file that should be active according to the manifest / directory."""
+        manifest = os.path.join(self.models_dir, MODEL_REGISTRY_MANIFEST)
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                active = json.load(f).get("active")
+            return os.path.join(self.models_dir, active) if active else None
+
+        files = [
+            p for p in glob.glob(os.path.join(self.models_dir, MODEL_REGISTRY_GLOB))
+            if os.path.basename(p) != MODEL_REGISTRY_MANIFEST
+        ]
+        return max(files, key=os.path.getmtime) if files else None
+
+    def check_now(self) -> bool:
+        """Load and swap in the candidate if it is a new version.  Returns True on swap."""
+        if self.pinned:
+            return False
+        try:
+            path = self.candidate_path()
+            if not path or not os.path.exists(path):
+                return False
+            mtime = os.path.getmtime(path)
+            if path == self._active.path and mtime == self._seen_mtime:
+                return False
+            version = file_version(path)
+            self._seen_mtime = mtime
+            if version == self._active.version:
+                return False
+            model = self._history.get(version) or load_and_warm(path)
+            self._swap(model)
+            self.last_error = None
+            return True
+        except Exception as e:
+            # Half-written or bad file: keep serving the current model, retry next poll
+            self.last_error = str(e)
+            log.warning("⚠️ Model reload failed: %s", e)
+            return False
+
+    # ─── PIN / ROLLBACK ───────────────────────────────────────────────────────
+    def pin(self, version: Optional[str] = None) -> LoadedModel:
+        """Serve `version` (default: the active one) until unpin()."""
+        if version and version != self._active.version:
+            model = self._history.get(version)
+            if model is None:
+                raise KeyError(version)
+            self._swap(model)
+        self.pinned = True
+        return self._active
+
+    def unpin(self):
+        self.pinned = False
+
+    def rollback(self) -> LoadedModel:
+        """Swap back to the previously active version and pin it."""
+        versions = list(self._history)
+        idx = versions.index(self._active.version)
+        if idx == 0:
+            raise KeyError("no previous version loaded")
+        return self.pin(versions[idx - 1])
+
+    # ─── WATCHER ──────────────────────────────────────────────────────────────
+    def start(self):
+        if self._thread is None and self.poll_seconds > 0:
+            self._thread = threading.Thread(target=self._watch, name="model-registry", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            self.check_now()
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active.info(),
+            "pinned": self.pinned,
+            "loaded_versions": [m.info() for m in self._history.values()],
+            "candidate": self.candidate_path(),
+            "poll_seconds": self.poll_seconds,
+            "last_error": self.last_error,
+        }
@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, Text, DateTime, func, String, ForeignKey
+from sqlalchemy import Column, Integer, Text, DateTime, func, String, ForeignKey, Index
 from sqlalchemy.orm import relationship  # ✅ Correct
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
@@ -33,6 +33,11 @@ class User(Base):
 # ────────────── CHAT MODEL ──────────────
 class ChatMessage(Base):
     __tablename__ = "chatbot_messages"
+    # Keyset pagination for /my-chats (chat_history.py): one range scan per
+    # page, newest first, read backwards
+    __table_args__ = (
+        Index("ix_chatbot_messages_user_created", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     chat_id = Column(UUID(as_uuid=True), default=uuid.uuid4, index=True)
@@ -0,0 +1,116 @@
+"""
+native_explainer.py
+
+Fault probability + per-feature contributions from a single XGBoost call.
+
+`Booster.predict(..., pred_contribs=True)` returns exact TreeSHAP values
+(the same "tree_path_dependent" algorithm shap.TreeExplainer uses) plus a
+bias column.  For a binary:logistic model the row sum of those columns is
+the raw margin, so the probability falls out of the same call and the
+serving path never needs to import `shap`.
+
+Run this file directly to check parity with shap.TreeExplainer:
+    python native_explainer.py [--rows 500] [--model models/xgb_fault_classifier_final.json]
+
+test_native_explainer.py runs the same check on a small model trained in
+the test, so it does not need models/.
+"""
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+DEFAULT_MODEL_PATH = "models/xgb_fault_classifier_final.json"
+
+
+def predict_with_contributions(booster: xgb.Booster, X, feature_names=None):
+    """
+    Score every row of X (a DataFrame, or a 2-D array plus feature_names)
+    in one pass.
+
+    Returns (probs, contribs) where probs has shape (n,) and contribs has
+    shape (n, n_features) in X's column order (bias column dropped).
+    """
+    dmat = xgb.DMatrix(X, feature_names=feature_names)
+    raw = booster.predict(dmat, pred_contribs=True)
+
+    # Last column is the bias (expected margin); the full row sum is the margin
+    margin = raw.sum(axis=1)
+    probs = 1.0 / (1.0 + np.exp(-margin))
+    return probs, raw[:, :-1]
+
+
+def top_contributions(contribs: np.ndarray, feature_names, top_k: int = 3) -> list:
+    """
+    Top-k features by |contribution| for every row, as
+    [[{"feature": ..., "shap_value": ...}, ...], ...].
+    """
+    features = np.asarray(feature_names)
+    top_idx = np.argsort(-np.abs(contribs), axis=1)[:, :top_k]
+    return [
+        [{"feature": str(features[j]), "shap_value": float(row[j])} for j in idx]
+        for row, idx in zip(contribs, top_idx)
+    ]
+
+
+# ─── PARITY CHECK AGAINST shap.TreeExplainer ─────────────────────────────────
+def check_parity(model_path: str = DEFAULT_MODEL_PATH, rows: int = 500,
+                 seed: int = 42, atol: float = 1e-4) -> dict:
+    """
+    Compare native contributions and probabilities with shap.TreeExplainer and
+    Booster.predict on synthetic rows.  Raises AssertionError on mismatch.
+    """
+    import shap  # only needed for the comparison
+
+    booster = xgb.Booster()
+    booster.load_model(model_path)
+    feature_names = booster.feature_names
+    if not feature_names:
+        from shap_explainer import feature_cols
+        feature_names = feature_cols
+
+    # Non-negative values on a log scale cover both hour counts and ratios;
+    # sprinkle NaNs so the default (missing-value) branches are exercised too
+    rng = np.random.default_rng(seed)
+    data = rng.lognormal(mean=1.0, sigma=1.5, size=(rows, len(feature_names)))
+    data[rng.random(data.shape) < 0.05] = np.nan
+    X = pd.DataFrame(data, columns=feature_names)
+
+    probs, contribs = predict_with_contributions(booster, X)
+
+    explainer = shap.TreeExplainer(booster, feature_perturbation="tree_path_dependent")
+    shap_vals = explainer(X).values
+    ref_probs = booster.predict(xgb.DMatrix(X))
+
+    shap_diff = float(np.nanmax(np.abs(contribs - shap_vals)))
+    prob_diff = float(np.max(np.abs(probs - ref_probs)))
+    assert shap_diff <= atol, f"SHAP mismatch: max |diff| = {shap_diff:.2e}"
+    assert prob_diff <= atol, f"Probability mismatch: max |diff| = {prob_diff:.2e}"
+
+    # Top-k ranking must agree wherever the values are not tied
+    native_top = top_contributions(contribs, feature_names)
+    shap_top = top_contributions(shap_vals, feature_names)
+    rank_mismatches = sum(
+        [e["feature"] for e in a] != [e["feature"] for e in b]
+        for a, b in zip(native_top, shap_top)
+    )
+
+    return {
+        "rows": rows,
+        "max_shap_diff": shap_diff,
+        "max_prob_diff": prob_diff,
+        "top_k_rank_mismatches": rank_mismatches,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Native contributions vs shap.TreeExplainer parity check")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--rows", type=int, default=500)
+    args = parser.parse_args()
+
+    result = check_parity(args.model, rows=args.rows)
+    print("✅ Native contributions match shap.TreeExplainer:")
+    for k, v in result.items():
+        print(f"  {k}: {v}")
@@ -0,0 +1,148 @@
+"""
+openrouter_client.py
+
+Shared, pooled async client for OpenRouter chat completions.
+
+One httpx.AsyncClient per process (HTTP/2, keep-alive) instead of a new
+TCP/TLS connection per call, with explicit timeouts and a small retry loop
+for 429/5xx responses.  Calls and retries are counted in telemetry
+(wtg_upstream_requests_total / wtg_upstream_retries_total).
+"""
+import asyncio
+import json
+import os
+from typing import AsyncIterator, List, Optional
+
+import certifi
+import httpx
+
+from telemetry import UPSTREAM_REQUESTS, UPSTREAM_RETRIES
+
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENROUTER_URL      = f"{OPENROUTER_BASE_URL}/chat/completions"
+DEEPSEEK_MODEL      = os.getenv("DEEPSEEK_MODEL", "deepseek/deepseek-chat")
+
+OPENROUTER_TIMEOUT         = float(os.getenv("OPENROUTER_TIMEOUT", "60"))
+OPENROUTER_CONNECT_TIMEOUT = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "5"))
+OPENROUTER_MAX_CONNECTIONS = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "100"))
+OPENROUTER_MAX_RETRIES     = int(os.getenv("OPENROUTER_MAX_RETRIES", "3"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def build_headers(api_key: Optional[str] = None) -> dict:
+    api_key = api_key or os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        raise RuntimeError("❌ OPENROUTER_API_KEY not found in environment variables.")
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "HTTP-Referer": "http://localhost",
+        "X-Title": "WindTurbineChatbot",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+    }
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=True,
+            verify=certifi.where(),
+            timeout=httpx.Timeout(OPENROUTER_TIMEOUT, connect=OPENROUTER_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=OPENROUTER_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENROUTER_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+        )
+    return _client
+
+
+async def aclose_async_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def chat_completion(messages: List[dict], api_key: Optional[str] = None,
+                          model: str = DEEPSEEK_MODEL,
+                          timeout: Optional[float] = None) -> str:
+    """
+    POST a chat completion and return the first choice's content.
+    Retries 429/5xx and transport errors with exponential backoff (1s, 2s, …).
+    """
+    payload = {"model": model, "messages": messages}
+    headers = build_headers(api_key)
+    client = get_async_client()
+    extra = {"timeout": timeout} if timeout else {}
+
+    try:
+        for attempt in range(OPENROUTER_MAX_RETRIES + 1):
+            try:
+                resp = await client.post(OPENROUTER_URL, json=payload, headers=headers, **extra)
+                if resp.status_code not in RETRY_STATUSES or attempt == OPENROUTER_MAX_RETRIES:
+                    resp.raise_for_status()
+                    break
+                reason = str(resp.status_code)
+            except httpx.TransportError as e:
+                if attempt == OPENROUTER_MAX_RETRIES:
+                    raise
+                reason = type(e).__name__
+            UPSTREAM_RETRIES.labels("openrouter", reason).inc()
+            await asyncio.sleep(2 ** attempt)
+
+        body = resp.json()
+        try:
+            content = body["choices"][0]["message"]["content"]
+        except (KeyError, IndexError):
+            raise RuntimeError(f"Unexpected completion format: {body!r}")
+    except Exception:
+        UPSTREAM_REQUESTS.labels("openrouter", "error").inc()
+        raise
+    UPSTREAM_REQUESTS.labels("openrouter", "ok").inc()
+    return content
+
+
+async def stream_chat_completion(messages: List[dict], api_key: Optional[str] = None,
+                                 model: str = DEEPSEEK_MODEL,
+                                 timeout: Optional[float] = None) -> AsyncIterator[str]:
+    """
+    Streaming chat completion (OpenRouter `stream: true`, SSE framing).
+    Yields content deltas as they arrive.  Not retried: once text has been
+    forwarded to the user a retry would duplicate it.
+    """
+    payload = {"model": model, "messages": messages, "stream": True}
+    headers = {**build_headers(api_key), "Accept": "text/event-stream"}
+    extra = {"timeout": timeout} if timeout else {}
+    try:
+        async for delta in _stream_deltas(payload, headers, extra):
+            yield delta
+    except Exception:
+        UPSTREAM_REQUESTS.labels("openrouter_stream", "error").inc()
+        raise
+    UPSTREAM_REQUESTS.labels("openrouter_stream", "ok").inc()
+
+
+async def _stream_deltas(payload: dict, headers: dict, extra: dict) -> AsyncIterator[str]:
+    async with get_async_client().stream("POST", OPENROUTER_URL, json=payload,
+                                         headers=headers, **extra) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            # Blank lines separate events; ":" lines are keep-alive comments
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            if "error" in chunk:
+                raise RuntimeError(f"OpenRouter stream error: {chunk['error']}")
+            try:
+                delta = chunk["choices"][0]["delta"].get("content")
+            except (KeyError, IndexError):
+                continue
+            if delta:
+                yield delta
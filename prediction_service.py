@@ -0,0 +1,431 @@
+"""
+prediction_service.py
+
+In-process fault prediction shared by the `/predict_fault` routes and the
+`/ask` pipeline, so a chat never has to POST back to its own server.
+
+Owns the model registry (hot-reloaded booster), the inference scheduler,
+the feature store and the feature-row queries.  Nothing is loaded at
+import; init() does it once (app lifespan, or the first prediction).
+Single-row predictions go through the micro-batching scheduler (or, with
+explain=False, the compiled model: no DMatrix, no contributions); batch
+endpoints and risk_history score their matrix directly.  With
+INFERENCE_POOL_ENABLED every predict + contributions call (and its top-k
+ranking) runs in inference_pool worker processes instead (matrices above
+INFERENCE_POOL_BULK_ROWS in a separate bulk pool), and the scheduler is
+not started.  Results are plain dicts in the PredictFaultResponse shape:
+    {"turbine_id", "log_date", "fault_probability", "explanations": [...],
+     "model_version"}
+"""
+import os
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+from sqlalchemy import bindparam, text
+
+import llm_cache
+import telemetry
+from db import engine
+from feature_store import FeatureStore
+from inference_pool import (INFERENCE_POOL_BULK_ROWS, INFERENCE_POOL_BULK_TIMEOUT, INFERENCE_POOL_BULK_WORKERS,
+                            INFERENCE_POOL_ENABLED, InferencePool, PoolBusy, PoolTimeout)
+from inference_scheduler import InferenceScheduler
+from model_registry import LoadedModel, ModelRegistry
+from native_explainer import predict_with_contributions, top_contributions
+from shap_explainer import feature_cols
+
+MODEL_PATH = os.getenv("FAULT_MODEL_PATH", "models/xgb_fault_classifier_final.json")
+
+# Upper bound on rows scored by one batch call (keeps a single request from
+# pulling years of fleet history into memory)
+MAX_BATCH_ROWS = int(os.getenv("MAX_BATCH_ROWS", "20000"))
+
+# Columns in wtg_features that are not model inputs
+NON_FEATURE_COLS = {
+    "dgr_id_no", "log_date", "turbine_id", "will_fault_occur",
+    "nor_1", "nor_2", "remarks", "updated_at"
+}
+
+MODEL_REGISTRY_ENABLED     = os.getenv("MODEL_REGISTRY_ENABLED", "1") == "1"
+INFERENCE_BATCHING_ENABLED = os.getenv("INFERENCE_BATCHING_ENABLED", "1") == "1"
+INFERENCE_BATCH_WINDOW_MS  = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "3"))
+INFERENCE_MAX_BATCH        = int(os.getenv("INFERENCE_MAX_BATCH", "64"))
+INFERENCE_TIMEOUT          = float(os.getenv("INFERENCE_TIMEOUT", "10"))
+FEATURE_STORE_ENABLED      = os.getenv("FEATURE_STORE_ENABLED", "1") == "1"
+
+# Built by init(): at app startup (lifespan) or on the first prediction,
+# never at import
+registry: Optional[ModelRegistry] = None
+scheduler: Optional[InferenceScheduler] = None
+pool: Optional[InferencePool] = None
+bulk_pool: Optional[InferencePool] = None
+feature_store: Optional[FeatureStore] = None
+_init_lock = threading.Lock()
+
+
+def init() -> ModelRegistry:
+    """
+    Load and warm the fault model, then start the scheduler, feature store
+    and registry watcher.  Idempotent and thread-safe.
+    """
+    global registry, scheduler, pool, bulk_pool, feature_store
+    if registry is not None:
+        return registry
+    with _init_lock:
+        if registry is not None:
+            return registry
+
+        # Load fault classification model; the registry watches the models
+        # directory and swaps in retrained versions once they are warmed up
+        reg = ModelRegistry(MODEL_PATH)
+        active_model = reg.current()
+
+        # Content fingerprint of the model file; cached LLM answers are keyed on it,
+        # so a retrained model never serves explanations written for the old one
+        if llm_cache.cache:
+            llm_cache.cache.set_context_version(active_model.version)
+
+        # CPU-bound inference in worker processes; each loads the model once
+        if INFERENCE_POOL_ENABLED:
+            pool = InferencePool(active_model)
+            bulk_pool = InferencePool(active_model, INFERENCE_POOL_BULK_WORKERS,
+                                      timeout=INFERENCE_POOL_BULK_TIMEOUT, name="bulk")
+
+        # Coalesce concurrent single-row predictions into one native call
+        elif INFERENCE_BATCHING_ENABLED:
+            scheduler = InferenceScheduler(active_model.booster, INFERENCE_BATCH_WINDOW_MS,
+                                           INFERENCE_MAX_BATCH, version=active_model.version)
+
+        # In-memory columnar copy of the model columns of wtg_features; lookups fall
+        # back to the DB until the first (background) load finishes or on a miss
+        feature_store = FeatureStore(engine, active_model.feature_names or feature_cols)
+        if FEATURE_STORE_ENABLED:
+            feature_store.refresh_async()
+
+        reg.on_swap(_on_model_swap)
+        if MODEL_REGISTRY_ENABLED:
+            reg.start()
+        registry = reg  # published last: non-None means fully initialised
+    return registry
+
+
+def is_ready() -> bool:
+    return registry is not None
+
+
+def shutdown():
+    for p in (pool, bulk_pool):
+        if p is not None:
+            p.close()
+
+
+def _on_model_swap(new: LoadedModel, old: LoadedModel):
+    global feature_store
+    if llm_cache.cache:
+        llm_cache.cache.set_context_version(new.version)
+    if scheduler is not None:
+        scheduler.set_model(new.booster, new.version)
+    # Warm the new version in fresh workers before they take jobs
+    for p in (pool, bulk_pool):
+        if p is not None:
+            p.swap_model(new)
+    # A model trained on different columns needs its own store layout
+    if new.feature_names and new.feature_names != feature_store.columns:
+        store = FeatureStore(engine, new.feature_names)
+        if FEATURE_STORE_ENABLED:
+            store.refresh_async()
+        feature_store = store
+
+
+# ─── FEATURE ROWS ──────────────────────────────────────────────────────────────
+def fetch_feature_row(turbine_id: str, log_date: Optional[str]) -> pd.DataFrame:
+    if log_date:
+        query = text("""
+            SELECT * FROM wtg_features
+            WHERE turbine_id = :turbine_id
+              AND log_date = :log_date
+            LIMIT 1;
+        """)
+        params = {"turbine_id": turbine_id, "log_date": log_date}
+    else:
+        query = text("""
+            SELECT * FROM wtg_features
+            WHERE turbine_id = :turbine_id
+            ORDER BY log_date DESC
+            LIMIT 1;
+        """)
+        params = {"turbine_id": turbine_id}
+    df = pd.read_sql_query(query, engine, params=params)
+    if df.empty:
+        raise HTTPException(status_code=404, detail="No data for given turbine/date")
+    return df
+
+
+def fetch_feature_rows(turbine_ids: Optional[List[str]],
+                       start_date: Optional[str],
+                       end_date: Optional[str]) -> pd.DataFrame:
+    """
+    With a date range: every row in [start_date, end_date] for the turbines.
+    Without one: the latest row per turbine (same as fetch_feature_row with
+    no log_date, but for the whole set at once).
+    """
+    filters, params = [], {}
+    if turbine_ids:
+        filters.append("f.turbine_id IN :turbine_ids")
+        params["turbine_ids"] = list(turbine_ids)
+
+    if start_date or end_date:
+        if start_date:
+            filters.append("f.log_date >= :start_date")
+            params["start_date"] = start_date
+        if end_date:
+            filters.append("f.log_date <= :end_date")
+            params["end_date"] = end_date
+        where = " AND ".join(filters)
+        sql = f"""
+            SELECT f.* FROM wtg_features f
+            WHERE {where}
+            ORDER BY f.turbine_id, f.log_date
+            LIMIT :max_rows
+        """
+    else:
+        where = ("WHERE " + " AND ".join(filters)) if filters else ""
+        sql = f"""
+            SELECT f.* FROM wtg_features f
+            JOIN (
+                SELECT turbine_id, MAX(log_date) AS log_date
+                FROM wtg_features f
+                {where}
+                GROUP BY turbine_id
+            ) latest
+              ON latest.turbine_id = f.turbine_id
+             AND latest.log_date = f.log_date
+            ORDER BY f.turbine_id
+            LIMIT :max_rows
+        """
+    params["max_rows"] = MAX_BATCH_ROWS + 1
+
+    query = text(sql)
+    if turbine_ids:
+        query = query.bindparams(bindparam("turbine_ids", expanding=True))
+    df = pd.read_sql_query(query, engine, params=params)
+    if len(df) > MAX_BATCH_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch would score more than {MAX_BATCH_ROWS} rows; narrow the turbines or date range"
+        )
+    # One (turbine_id, log_date) pair per row even if the table has duplicates
+    return df.drop_duplicates(subset=["turbine_id", "log_date"]).reset_index(drop=True)
+
+
+# ─── PREDICTION ────────────────────────────────────────────────────────────────
+def score(model: LoadedModel, X, feature_names=None, top_k: int = 0, path: str = "inline"):
+    """
+    (probs, contribs, top) for X: in a pool worker when the pool is on,
+    otherwise in this thread.  `top` is the per-row top-k list (None when
+    top_k is 0).  A full pool is a 503, a job timeout a 504.
+    """
+    t0 = time.perf_counter()
+    if pool is not None:
+        lane = bulk_pool if len(X) > INFERENCE_POOL_BULK_ROWS else pool
+        try:
+            probs, contribs, top = lane.score(model, X, feature_names, top_k)
+        except PoolBusy as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except PoolTimeout as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        telemetry.observe_inference(f"pool_{lane.name}", time.perf_counter() - t0, len(X))
+        return probs, contribs, top
+
+    probs, contribs = predict_with_contributions(model.booster, X, feature_names)
+    telemetry.observe_inference(path, time.perf_counter() - t0, len(X))
+    top = None
+    if top_k:
+        with telemetry.span("shap"):
+            top = top_contributions(contribs, feature_names if feature_names is not None else X.columns, top_k)
+    return probs, contribs, top
+
+
+def predict_fault_for(turbine_id: str, log_date: Optional[str] = None, top_k: int = 3,
+                      timings: Optional[dict] = None, explain: bool = True) -> dict:
+    """
+    Fault probability and top-k SHAP contributions for one turbine on one
+    date (latest available date when log_date is None).  The feature
+    lookup, inference and top-k SHAP steps are telemetry spans; `timings`,
+    if given, receives them in ms.  explain=False returns the probability
+    only (empty explanations), from the compiled model when there is one.
+    """
+    init()
+    t0 = time.perf_counter()
+    row = None
+    store = feature_store  # may be replaced by a model swap mid-request
+    if FEATURE_STORE_ENABLED:
+        store.maybe_refresh()
+        row = store.lookup(turbine_id, log_date)
+
+    if row is not None:
+        # Store hit: a float32 vector already in model column order
+        X = row.values.reshape(1, -1)
+        feature_names = store.columns
+        resolved_date = row.log_date
+    else:
+        df = fetch_feature_row(turbine_id, log_date)
+
+        # Drop everything that isn't a numeric feature
+        features = df.drop(columns=[c for c in NON_FEATURE_COLS if c in df.columns])
+        X = features.to_numpy(dtype=np.float32)
+        feature_names = list(features.columns)
+        resolved_date = str(pd.Timestamp(df["log_date"].iloc[0]).date())
+    t1 = time.perf_counter()
+    telemetry.record("features", t1 - t0, timings)
+
+    model = registry.current()
+    if not explain and model.compiled is not None:
+        prob = model.compiled.predict_proba_row(X[0], feature_names)
+        telemetry.observe_inference("compiled", time.perf_counter() - t1, 1)
+        telemetry.record("inference", time.perf_counter() - t1, timings)
+        return {
+            "turbine_id": turbine_id,
+            "log_date": resolved_date,
+            "fault_probability": float(prob),
+            "explanations": [],
+            "model_version": model.version,
+        }
+
+    # Probability and SHAP contributions from the same native XGBoost call,
+    # batched with whatever other single-row requests arrive alongside
+    if scheduler is not None:
+        prob, row_contribs, version = scheduler.predict(X[0], feature_names, timeout=INFERENCE_TIMEOUT)
+        contribs, top = row_contribs.reshape(1, -1), None
+    else:
+        probs, contribs, top = score(model, X, feature_names, top_k)
+        prob, version = probs[0], model.version
+    telemetry.record("inference", time.perf_counter() - t1, timings)
+
+    with telemetry.span("shap", timings):
+        explanations = (top or top_contributions(contribs, feature_names, top_k))[0]
+    return {
+        "turbine_id": turbine_id,
+        "log_date": resolved_date,
+        "fault_probability": float(prob),
+        "explanations": explanations,
+        "model_version": version,
+    }
+
+
+def predict_fault_batch(turbine_ids: Optional[List[str]] = None,
+                        start_date: Optional[str] = None,
+                        end_date: Optional[str] = None,
+                        top_k: int = 3) -> List[dict]:
+    init()
+    df = fetch_feature_rows(turbine_ids, start_date, end_date)
+    if df.empty:
+        return []
+
+    X = df.drop(columns=[c for c in NON_FEATURE_COLS if c in df.columns])
+
+    # One DMatrix and one native predict/contributions pass over the whole matrix
+    model = registry.current()
+    probs, _, top = score(model, X, top_k=top_k, path="batch_endpoint")
+
+    log_dates = pd.to_datetime(df["log_date"]).dt.strftime("%Y-%m-%d")
+    return [
+        {
+            "turbine_id": tid,
+            "log_date": d,
+            "fault_probability": float(p),
+            "explanations": row_top,
+            "model_version": model.version,
+        }
+        for tid, d, p, row_top in zip(df["turbine_id"], log_dates, probs, top)
+    ]
+
+
+# ─── RISK HISTORY ──────────────────────────────────────────────────────────────
+DEFAULT_HISTORY_DAYS = 90
+
+
+def fetch_recent_rows(turbine_id: str, days: int) -> pd.DataFrame:
+    """The turbine's rows in the `days` calendar days up to its latest date, in one query."""
+    df = pd.read_sql_query(text("""
+        SELECT * FROM wtg_features
+        WHERE turbine_id = :turbine_id
+        ORDER BY log_date DESC
+        LIMIT :days
+    """), engine, params={"turbine_id": turbine_id, "days": min(days, MAX_BATCH_ROWS)})
+    if df.empty:
+        return df
+    dates = pd.to_datetime(df["log_date"])
+    df = df[dates > dates.max() - pd.Timedelta(days=days)]
+    return df.iloc[::-1].drop_duplicates(subset=["turbine_id", "log_date"]).reset_index(drop=True)
+
+
+def risk_history(turbine_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                 days: Optional[int] = None, top_k: int = 3,
+                 rolling: Optional[List[int]] = None) -> dict:
+    """
+    Fault-probability series for one turbine over a date range: one feature
+    query and one batched predict/contributions call for the whole range.
+
+    Range: start_date/end_date if given (an open end runs to the latest
+    row); `days` with only one of them fixes the other end (start_date +
+    days - 1, or end_date - days + 1); with `days` alone (default
+    DEFAULT_HISTORY_DAYS), the last `days` calendar days of data.  `rolling` adds a `rolling_<w>d` calendar-window
+    mean to every point.  `explanations` ranks features by their mean
+    contribution over the whole range.
+    """
+    init()
+    with telemetry.span("features"):
+        if start_date or end_date:
+            if days and end_date and not start_date:
+                start_date = str((pd.Timestamp(end_date) - pd.Timedelta(days=days - 1)).date())
+            elif days and start_date and not end_date:
+                end_date = str((pd.Timestamp(start_date) + pd.Timedelta(days=days - 1)).date())
+            df = fetch_feature_rows([turbine_id], start_date, end_date)
+        else:
+            df = fetch_recent_rows(turbine_id, days or DEFAULT_HISTORY_DAYS)
+    if df.empty:
+        raise HTTPException(status_code=404, detail="No data for given turbine/date range")
+
+    X = df.drop(columns=[c for c in NON_FEATURE_COLS if c in df.columns])
+    model = registry.current()
+    probs, contribs, daily_top = score(model, X, top_k=top_k, path="risk_history")
+
+    with telemetry.span("shap"):
+        overall_top = top_contributions(contribs.mean(axis=0, keepdims=True), X.columns, top_k)[0]
+
+    dates = pd.to_datetime(df["log_date"])
+    series = pd.Series(probs.astype(float), index=dates)
+    rolled = {f"rolling_{w}d": series.rolling(f"{w}D", min_periods=1).mean().to_numpy()
+              for w in sorted(set(rolling or [])) if w > 0}
+
+    day_strings = dates.dt.strftime("%Y-%m-%d").tolist()
+    points = []
+    for i, (d, p, row_top) in enumerate(zip(day_strings, series.to_numpy(), daily_top)):
+        point = {"log_date": d, "fault_probability": float(p), "explanations": row_top}
+        for key, values in rolled.items():
+            point[key] = float(values[i])
+        points.append(point)
+
+    return {
+        "turbine_id": turbine_id,
+        "start_date": day_strings[0],
+        "end_date": day_strings[-1],
+        "count": len(points),
+        "model_version": model.version,
+        "summary": {
+            "first": float(series.iloc[0]),
+            "last": float(series.iloc[-1]),
+            "change": float(series.iloc[-1] - series.iloc[0]),
+            "mean": float(series.mean()),
+            "max": float(series.max()),
+            "max_date": day_strings[int(series.to_numpy().argmax())],
+            "min": float(series.min()),
+        },
+        "explanations": overall_top,
+        "series": points,
+    }
@@ -0,0 +1,138 @@
+"""
+profile_startup.py
+
+Cold-start profile of the API worker.
+
+Each run imports the module in a fresh interpreter with `python -X importtime`
+and reports the wall-clock import time plus the slowest imports.  With
+--ready it also times app.warm_up() (schema + model load), i.e. how long
+until /readyz turns green.
+
+    python profile_startup.py --json after.json
+    git stash; python profile_startup.py --json before.json; git stash pop
+    python profile_startup.py --compare before.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+IMPORT_SNIPPET = """
+import time, json
+t0 = time.perf_counter()
+import {module}
+t1 = time.perf_counter()
+out = {{"import_seconds": t1 - t0}}
+if {ready}:
+    {module}.warm_up()
+    out["warm_up_seconds"] = time.perf_counter() - t1
+    out["startup_state"] = {module}.startup_state
+print("__PROFILE__" + json.dumps(out, default=str))
+"""
+
+
+def parse_importtime(stderr: str):
+    """`-X importtime` lines → [(module, self_us, cumulative_us, depth)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        try:
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue
+        # One separator space, then two spaces per nesting level
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((name.strip(), self_us, cumulative_us, depth))
+    return rows
+
+
+def profile_once(module: str, ready: bool) -> dict:
+    code = IMPORT_SNIPPET.format(module=module, ready=ready)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    result = {"ok": proc.returncode == 0}
+    for line in proc.stdout.splitlines():
+        if line.startswith("__PROFILE__"):
+            result.update(json.loads(line[len("__PROFILE__"):]))
+    rows = parse_importtime(proc.stderr)
+    # Only the direct imports of first-party modules and top-level packages
+    top = [r for r in rows if r[3] <= 1]
+    result["imports"] = {name: cumulative / 1e6 for name, _, cumulative, _ in top}
+
+    if not result["ok"]:
+        errors = [l for l in proc.stderr.splitlines()
+                  if not l.startswith("import time:") and ("Error" in l or "Exception" in l)]
+        result["error"] = errors[-1].strip() if errors else "unknown"
+        # The import itself may have finished before warm_up (or a crash) failed
+        result.setdefault("import_seconds", result["imports"].get(module))
+    return result
+
+
+def profile(module: str = "app", runs: int = 3, ready: bool = False, top: int = 15) -> dict:
+    samples = [profile_once(module, ready) for _ in range(runs)]
+    best = min(samples, key=lambda s: s.get("import_seconds", float("inf")))
+    slowest = sorted(best["imports"].items(), key=lambda kv: -kv[1])[:top]
+    report = {
+        "module": module,
+        "runs": runs,
+        "ok": best["ok"],
+        "import_seconds": best.get("import_seconds"),
+        "slowest_imports": dict(slowest),
+    }
+    for key in ("warm_up_seconds", "startup_state", "error"):
+        if key in best:
+            report[key] = best[key]
+    return report
+
+
+def print_report(report: dict, baseline: dict = None):
+    def fmt(v):
+        return f"{v:8.3f}s" if isinstance(v, (int, float)) else f"{'n/a':>9s}"
+
+    status = "✅" if report["ok"] else f"❌ ({report.get('error')})"
+    print(f"\n{status} import {report['module']}: {fmt(report['import_seconds'])} (best of {report['runs']})")
+    if "warm_up_seconds" in report:
+        print(f"   warm_up (schema + model): {fmt(report['warm_up_seconds'])}")
+    if baseline:
+        before, after = baseline.get("import_seconds"), report.get("import_seconds")
+        print(f"   before: {fmt(before)}   after: {fmt(after)}")
+        if before and after:
+            print(f"   speed-up: {before / after:.1f}x")
+
+    print(f"\n{'slowest imports':40s} {'cumulative':>10s}" + (f" {'before':>10s}" if baseline else ""))
+    for name, seconds in report["slowest_imports"].items():
+        line = f"{name:40s} {seconds:>9.3f}s"
+        if baseline:
+            prev = baseline.get("slowest_imports", {}).get(name)
+            line += f" {prev:>9.3f}s" if prev is not None else f" {'-':>10s}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start import profile of the API")
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--ready", action="store_true", help="also time app.warm_up() (needs DB + model)")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", help="earlier report (e.g. before.json) to compare against")
+    args = parser.parse_args()
+
+    report = profile(args.module, args.runs, args.ready, args.top)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, default=str)
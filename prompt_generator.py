@@ -14,3 +14,44 @@ In addition, these real-world error logs were recorded on the same date:
 Explain in natural language why the fault risk is elevated or low for this turbine on that date.
 Use both model reasoning and operational evidence. Keep it clear for engineers and managers.
 """
+
+
+# Points of the series quoted in a trend prompt (evenly spaced, always
+# including the first and last day)
+TREND_PROMPT_POINTS = 12
+
+
+def format_risk_trend(history):
+    summary = history["summary"]
+    series = history["series"]
+    step = max(1, -(-len(series) // TREND_PROMPT_POINTS))
+    picked = series[::step]
+    if picked[-1] is not series[-1]:
+        picked.append(series[-1])
+    lines = [
+        f"Period: {history['start_date']} to {history['end_date']} ({history['count']} days with data)",
+        f"Fault risk: {summary['first'] * 100:.1f}% → {summary['last'] * 100:.1f}% "
+        f"(change {summary['change'] * 100:+.1f} points), mean {summary['mean'] * 100:.1f}%, "
+        f"peak {summary['max'] * 100:.1f}% on {summary['max_date']}",
+        "Daily fault risk:",
+    ]
+    lines += [f"• {p['log_date']}: {p['fault_probability'] * 100:.1f}%" for p in picked]
+    return "\n".join(lines)
+
+
+def generate_trend_prompt(user_question, trend_text, shap_text):
+    return f"""
+You are a wind turbine fault analysis assistant.
+
+A user asked:
+"{user_question}"
+
+The model scored this turbine for every day in the period:
+{trend_text}
+
+Over the whole period, these factors contributed most to the turbine's fault risk:
+{shap_text}
+
+Explain how the fault risk developed over this period and what drove the main changes.
+Point out anything operators should act on. Keep it clear for engineers and managers.
+"""
@@ -7,6 +7,24 @@ import SignupForm from './components/SignupForm';
 import { useLocalStorage } from './hooks/useLocalStorage';
 import { Chat, Message } from './types/chat';
 import { generateChatTitle } from './utils/chatUtils';
+import { streamQuestion, getMyChats, getMyChat, ChatSummary } from './api';
+
+const CHAT_PAGE_SIZE = 30;
+
+const toMessages = (item: ChatSummary): Message[] => [
+  {
+    id: `user-${item.id}`,
+    content: item.question,
+    isBot: false,
+    timestamp: new Date(item.created_at),
+  },
+  {
+    id: `bot-${item.id}`,
+    content: item.answer ?? "",
+    isBot: true,
+    timestamp: new Date(item.created_at),
+  },
+];
 
 function App() {
   const [chats, setChats] = useState<Chat[]>([]);
@@ -15,6 +33,9 @@ function App() {
   const [isTyping, setIsTyping] = useState(false);
   const [isDarkMode, setIsDarkMode] = useLocalStorage('windtech-dark-mode', true);
   const [isSidebarOpen, setIsSidebarOpen] = useState(false);
+  // Chat history paging: cursor for the next (older) page, null when done
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingChats, setIsLoadingChats] = useState(false);
 
   // Auth
   const [token, setToken] = useState<string | null>(null);
@@ -29,45 +50,39 @@ function App() {
   }, []);
 
   // ✅ fetchUserChats must be defined BEFORE useEffect
-  const fetchUserChats = useCallback(async () => {
+  // Loads one page of the sidebar list (titles only); `before` continues
+  // from the previous page's cursor and appends
+  const fetchUserChats = useCallback(async (before: string | null = null) => {
     if (!token) return;
 
+    setIsLoadingChats(true);
     try {
-      const res = await fetch("http://localhost:8000/my-chats", {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
+      const { data } = await getMyChats(before, CHAT_PAGE_SIZE, true);
 
-      const data = await res.json();
-
-      const userChats: Chat[] = data.map((item: any, index: number) => ({
-        id: `chat-${index}`,
+      const userChats: Chat[] = data.items.map((item) => ({
+        id: `chat-${item.id}`,
+        serverId: item.id,
         title: item.question.slice(0, 20) + "...",
-        messages: [
-          {
-            id: `user-${index}`,
-            content: item.question,
-            isBot: false,
-            timestamp: new Date(item.created_at),
-          },
-          {
-            id: `bot-${index}`,
-            content: item.answer,
-            isBot: true,
-            timestamp: new Date(item.created_at),
-          },
-        ],
+        messages: [],
         createdAt: new Date(item.created_at),
         updatedAt: new Date(item.created_at),
       }));
 
-      setChats(userChats);
+      setChats((prev) => (before ? [...prev, ...userChats] : userChats));
+      setNextCursor(data.next_cursor);
     } catch (error) {
       console.error("❌ Failed to load user chats:", error);
+    } finally {
+      setIsLoadingChats(false);
     }
   }, [token]);
 
+  const loadMoreChats = useCallback(() => {
+    if (nextCursor && !isLoadingChats) {
+      fetchUserChats(nextCursor);
+    }
+  }, [nextCursor, isLoadingChats, fetchUserChats]);
+
   useEffect(() => {
     if (view === "chat" && token && chats.length === 0) {
       fetchUserChats();
@@ -102,6 +117,20 @@ function App() {
     }
   }, [currentChatId, chats]);
 
+  // History entries only carry their title; fetch the full chat on open
+  useEffect(() => {
+    const chat = chats.find(c => c.id === currentChatId);
+    if (!chat || chat.serverId === undefined || chat.messages.length > 0) return;
+
+    getMyChat(chat.serverId)
+      .then(({ data }) => {
+        setChats((prev) => prev.map((c) =>
+          c.id === chat.id ? { ...c, messages: toMessages(data) } : c
+        ));
+      })
+      .catch((error) => console.error("❌ Failed to load chat:", error));
+  }, [currentChatId, chats]);
+
   const createNewChat = useCallback(() => {
     setCurrentChatId(null);
     setCurrentMessages([]);
@@ -134,35 +163,40 @@ function App() {
       setCurrentChatId(chatId);
     }
 
-    let botMessage: Message;
+    const botId = `bot-${Date.now()}`;
+    let answer = "";
+    const showBot = (text: string) => {
+      setIsTyping(false);
+      setCurrentMessages([
+        ...newMessages,
+        { id: botId, content: text, isBot: true, timestamp: new Date() },
+      ]);
+    };
 
     try {
-      const res = await fetch("http://localhost:8000/ask", {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-          Authorization: `Bearer ${token}`,
+      // Tokens are rendered as they stream in instead of after the full answer
+      await streamQuestion(content, {
+        onToken: (text) => {
+          answer += text;
+          showBot(answer);
+        },
+        onError: (detail) => {
+          answer = detail;
+          showBot(answer);
         },
-        body: JSON.stringify({ question: content }),
       });
-
-      const data = await res.json();
-
-      botMessage = {
-        id: `bot-${Date.now()}`,
-        content: data.answer || "⚠️ No response from model.",
-        isBot: true,
-        timestamp: new Date()
-      };
+      if (!answer) answer = "⚠️ No response from model.";
     } catch (error) {
-      botMessage = {
-        id: `bot-${Date.now()}`,
-        content: `❌ Error: ${(error as Error).message}`,
-        isBot: true,
-        timestamp: new Date()
-      };
+      answer = `❌ Error: ${(error as Error).message}`;
     }
 
+    const botMessage: Message = {
+      id: botId,
+      content: answer,
+      isBot: true,
+      timestamp: new Date()
+    };
+
     const finalMessages = [...newMessages, botMessage];
     setCurrentMessages(finalMessages);
     setIsTyping(false);
@@ -189,7 +223,7 @@ function App() {
         return [newChat, ...prevChats];
       }
     });
-  }, [currentMessages, currentChatId, setChats, token]);
+  }, [currentMessages, currentChatId, setChats]);
 
   const toggleDarkMode = useCallback(() => {
     setIsDarkMode(!isDarkMode);
@@ -228,6 +262,9 @@ function App() {
           currentChatId={currentChatId}
           onNewChat={createNewChat}
           onSelectChat={selectChat}
+          onLoadMore={loadMoreChats}
+          hasMore={nextCursor !== null}
+          isLoadingMore={isLoadingChats}
           isDarkMode={isDarkMode}
         />
       </div>
@@ -16,5 +16,77 @@ export const login = (email: string, password: string) =>
 export const askQuestion = (question: string) =>
   axios.post(`${API_BASE}/ask`, { question }, { headers: getAuthHeaders() });
 
-export const getMyChats = () =>
-  axios.get(`${API_BASE}/my-chats`, { headers: getAuthHeaders() });
+export interface ChatSummary {
+  id: number;
+  chat_id: string | null;
+  question: string;
+  created_at: string;
+  answer?: string;
+  intent?: string | null;
+}
+
+export interface ChatPage {
+  items: ChatSummary[];
+  next_cursor: string | null;
+}
+
+// One keyset page of chat history, newest first; pass next_cursor as `before`
+export const getMyChats = (before?: string | null, limit = 30, light = false) =>
+  axios.get<ChatPage>(`${API_BASE}/my-chats`, {
+    headers: getAuthHeaders(),
+    params: { limit, light, ...(before ? { before } : {}) },
+  });
+
+export const getMyChat = (id: number) =>
+  axios.get<ChatSummary>(`${API_BASE}/my-chats/${id}`, { headers: getAuthHeaders() });
+
+export interface StreamHandlers {
+  onExplanations?: (prediction: any) => void;
+  onToken?: (text: string) => void;
+  onDone?: (answer: string) => void;
+  onError?: (detail: string) => void;
+}
+
+// POST /ask/stream and dispatch its Server-Sent Events as they arrive
+// (EventSource can't POST, so the stream is read with fetch)
+export const streamQuestion = async (question: string, handlers: StreamHandlers) => {
+  const res = await fetch(`${API_BASE}/ask/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", ...getAuthHeaders() },
+    body: JSON.stringify({ question }),
+  });
+  if (!res.ok || !res.body) {
+    throw new Error(`Request failed with status ${res.status}`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  const dispatch = (raw: string) => {
+    let event = "message";
+    const data: string[] = [];
+    for (const line of raw.split("\n")) {
+      if (line.startsWith("event:")) event = line.slice(6).trim();
+      else if (line.startsWith("data:")) data.push(line.slice(5).trim());
+    }
+    if (data.length === 0) return;
+    const payload = JSON.parse(data.join("\n"));
+    if (event === "explanations") handlers.onExplanations?.(payload);
+    else if (event === "token") handlers.onToken?.(payload.text);
+    else if (event === "done") handlers.onDone?.(payload.answer);
+    else if (event === "error") handlers.onError?.(payload.detail);
+  };
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) >= 0) {
+      dispatch(buffer.slice(0, sep));
+      buffer = buffer.slice(sep + 2);
+    }
+  }
+  if (buffer.trim()) dispatch(buffer);
+};
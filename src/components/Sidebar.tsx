@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useEffect, useRef } from 'react';
 import { Plus, MessageSquare, Settings } from 'lucide-react';
 import { Chat } from '../types/chat';
 import { formatChatTime } from '../utils/chatUtils';
@@ -8,6 +8,9 @@ interface SidebarProps {
   currentChatId: string | null;
   onNewChat: () => void;
   onSelectChat: (chatId: string) => void;
+  onLoadMore?: () => void;
+  hasMore?: boolean;
+  isLoadingMore?: boolean;
   isDarkMode: boolean;
 }
 
@@ -16,8 +19,30 @@ const Sidebar: React.FC<SidebarProps> = ({
   currentChatId, 
   onNewChat, 
   onSelectChat,
+  onLoadMore,
+  hasMore = false,
+  isLoadingMore = false,
   isDarkMode 
 }) => {
+  const listRef = useRef<HTMLDivElement>(null);
+  const sentinelRef = useRef<HTMLDivElement>(null);
+
+  // Infinite scroll: ask for the next page when the end of the list comes
+  // into view (with some margin so it is usually loaded before it's reached)
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!sentinel || !hasMore || !onLoadMore) return;
+
+    const observer = new IntersectionObserver(
+      (entries) => {
+        if (entries[0].isIntersecting) onLoadMore();
+      },
+      { root: listRef.current, rootMargin: '200px' }
+    );
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [hasMore, onLoadMore, chats.length]);
+
   return (
     <div className="w-80 bg-gray-50 dark:bg-gray-800 border-r border-gray-200 dark:border-gray-700 flex flex-col h-full">
       {/* Header */}
@@ -44,7 +69,7 @@ const Sidebar: React.FC<SidebarProps> = ({
       </div>
 
       {/* Chat History */}
-      <div className="flex-1 overflow-y-auto p-4">
+      <div ref={listRef} className="flex-1 overflow-y-auto p-4">
         <h3 className="text-sm font-medium text-gray-500 dark:text-gray-400 mb-3 uppercase tracking-wider">
           Recent Chats
         </h3>
@@ -85,6 +110,13 @@ const Sidebar: React.FC<SidebarProps> = ({
                 </div>
               </button>
             ))}
+
+            {hasMore && <div ref={sentinelRef} className="h-1" />}
+            {isLoadingMore && (
+              <p className="text-xs text-center text-gray-500 dark:text-gray-400 py-2">
+                Loading older chats…
+              </p>
+            )}
           </div>
         )}
       </div>
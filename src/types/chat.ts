@@ -7,6 +7,9 @@ export interface Message {
 
 export interface Chat {
   id: string;
+  // chatbot_messages.id for chats loaded from history; their messages are
+  // fetched when the chat is opened
+  serverId?: number;
   title: string;
   messages: Message[];
   createdAt: Date;
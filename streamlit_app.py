@@ -1,8 +1,23 @@
 # streamlit_app.py
+import json
 import streamlit as st
 import requests
 
-API_URL = "http://localhost:8000/ask"
+API_URL = "http://localhost:8000"
+STREAM_URL = f"{API_URL}/ask/stream"
+
+def iter_sse(resp):
+    """Yield (event, data) pairs from a text/event-stream response."""
+    event, data = "message", []
+    for line in resp.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
 
 st.set_page_config(page_title="Wind Turbine Fault Assistant")
 st.title("🔍 Wind Turbine Fault Risk Assistant")
@@ -16,10 +31,21 @@ if st.button("Ask"):
     else:
         with st.spinner("Analyzing..."):
             try:
-                resp = requests.post(API_URL, json={"question": user_query})
+                resp = requests.post(STREAM_URL, json={"question": user_query}, stream=True)
                 resp.raise_for_status()
-                data = resp.json()
                 st.markdown("### Answer:")
-                st.write(data["answer"])
+                answer_box = st.empty()
+                answer = ""
+                for event, data in iter_sse(resp):
+                    if event == "explanations":
+                        st.caption(
+                            f"Fault probability for {data['turbine_id']} on {data['log_date']}: "
+                            f"{data['fault_probability']:.1%}"
+                        )
+                    elif event == "token":
+                        answer += data["text"]
+                        answer_box.markdown(answer)
+                    elif event == "error":
+                        st.error(data["detail"])
             except requests.exceptions.RequestException as e:
                 st.error(f"API request failed: {e}")
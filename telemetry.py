@@ -0,0 +1,145 @@
+"""
+telemetry.py
+
+Spans, Prometheus metrics and sampled debug logging.
+
+    with span("error_logs", timings):
+        ...
+
+A span observes `wtg_stage_seconds{stage=…}` and, when a request's
+`timings` dict is passed, records the stage in ms for the Server-Timing
+header.  app.py serves everything at GET /metrics.
+
+Metrics
+    wtg_http_request_seconds{method, route, status}
+    wtg_stage_seconds{stage}                slot_rules, slot_filling, features,
+                                            inference, shap, error_logs, prompt,
+                                            llm, save_chat, …
+    wtg_inference_seconds{path}             batched | inline | batch_endpoint |
+                                            risk_history | export | fleet_risk |
+                                            compiled | pool_inference | pool_bulk
+    wtg_inference_batch_size
+    wtg_upstream_requests_total{upstream, outcome}
+    wtg_upstream_retries_total{upstream, reason}
+    wtg_db_pool_*                           read from db.pool_stats() at scrape time
+    wtg_inference_queue_depth
+    wtg_inference_pool_pending{pool}        jobs queued or running in worker processes
+
+configure_logging() sets up the root handler; app.py calls it at startup,
+importing this module leaves logging alone.
+
+Payload logging goes through `sampled()`: a debug line is only built for
+LOG_SAMPLE_RATE of the calls, and only when DEBUG is enabled for the logger.
+"""
+import logging
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+LOG_LEVEL       = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+LOG_FORMAT      = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+log = logging.getLogger("wtg")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_SECONDS = Histogram(
+    "wtg_http_request_seconds", "HTTP request latency", ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "wtg_stage_seconds", "Latency of one pipeline stage", ["stage"], buckets=LATENCY_BUCKETS,
+)
+INFERENCE_SECONDS = Histogram(
+    "wtg_inference_seconds", "Native predict + contributions call", ["path"], buckets=LATENCY_BUCKETS,
+)
+INFERENCE_BATCH_SIZE = Histogram(
+    "wtg_inference_batch_size", "Rows per native inference call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 512, 2048, 20000),
+)
+UPSTREAM_REQUESTS = Counter(
+    "wtg_upstream_requests_total", "Calls to external services", ["upstream", "outcome"],
+)
+UPSTREAM_RETRIES = Counter(
+    "wtg_upstream_retries_total", "Retried calls to external services", ["upstream", "reason"],
+)
+
+
+# ─── SPANS ─────────────────────────────────────────────────────────────────────
+def record(stage: str, seconds: float, timings: Optional[dict] = None):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    if timings is not None:
+        timings[stage] = seconds * 1000.0
+
+
+@contextmanager
+def span(stage: str, timings: Optional[dict] = None):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - t0, timings)
+
+
+def observe_inference(path: str, seconds: float, rows: int):
+    INFERENCE_SECONDS.labels(path).observe(seconds)
+    INFERENCE_BATCH_SIZE.observe(rows)
+
+
+# ─── LOGGING ───────────────────────────────────────────────────────────────────
+def configure_logging(level: str = LOG_LEVEL):
+    """Root handler at LOG_LEVEL; a no-op if the host (e.g. a test runner) already set one."""
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+
+def sampled(logger: logging.Logger = log) -> bool:
+    """
+    True for LOG_SAMPLE_RATE of calls when DEBUG is on.  Guard payload logs
+    with it so the payload is never even formatted otherwise:
+        if sampled(log): log.debug("payload %s", json.dumps(payload))
+    """
+    return logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_SAMPLE_RATE
+
+
+# ─── SCRAPE-TIME GAUGES ────────────────────────────────────────────────────────
+def _pool_value(key: str) -> float:
+    from db import pool_stats
+    return float(pool_stats().get(key) or 0)
+
+
+for _key in ("size", "checkedout", "overflow", "utilization"):
+    Gauge(f"wtg_db_pool_{_key}", f"DB pool {_key} (this process)").set_function(
+        lambda key=_key: _pool_value(key)
+    )
+
+
+def _queue_depth() -> float:
+    # Only if the model side is loaded; never import it just for a scrape
+    service = sys.modules.get("prediction_service")
+    scheduler = getattr(service, "scheduler", None)
+    return float(scheduler.stats()["queue_depth"]) if scheduler else 0.0
+
+
+Gauge("wtg_inference_queue_depth", "Requests waiting for the micro-batcher").set_function(_queue_depth)
+
+
+def _pool_pending(attr: str) -> float:
+    pool = getattr(sys.modules.get("prediction_service"), attr, None)
+    return float(pool.pending()) if pool else 0.0
+
+
+_pool_gauge = Gauge("wtg_inference_pool_pending", "Jobs queued or running in an inference pool", ["pool"])
+for _name, _attr in (("inference", "pool"), ("bulk", "bulk_pool")):
+    _pool_gauge.labels(_name).set_function(lambda attr=_attr: _pool_pending(attr))
+
+
+def metrics_payload():
+    """(body, content_type) for GET /metrics."""
+    return generate_latest(), CONTENT_TYPE_LATEST
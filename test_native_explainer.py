@@ -0,0 +1,50 @@
+"""
+test_native_explainer.py
+
+predict_with_contributions must match shap.TreeExplainer (contributions)
+and Booster.predict (probability) on a tiny model trained here, so the
+check does not depend on models/ being present.
+
+    python -m pytest -q test_native_explainer.py
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from native_explainer import check_parity, predict_with_contributions
+
+shap = pytest.importorskip("shap")
+
+FEATURES = [f"f{i}" for i in range(6)]
+
+
+def _train(seed: int = 0) -> xgb.Booster:
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(400, len(FEATURES))), columns=FEATURES)
+    X[X > 2.0] = np.nan  # missing values take the default branches
+    y = ((X["f0"].fillna(0) + 0.5 * X["f3"].fillna(0) ** 2) > 0.5).astype(int)
+    return xgb.train({"objective": "binary:logistic", "max_depth": 4, "eta": 0.3},
+                     xgb.DMatrix(X, y), num_boost_round=30)
+
+
+def test_contributions_match_tree_explainer():
+    booster = _train()
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(200, len(FEATURES))), columns=FEATURES)
+
+    probs, contribs = predict_with_contributions(booster, X)
+
+    shap_vals = shap.TreeExplainer(booster, feature_perturbation="tree_path_dependent")(X).values
+    assert contribs.shape == shap_vals.shape
+    np.testing.assert_allclose(contribs, shap_vals, atol=1e-5)
+    np.testing.assert_allclose(probs, booster.predict(xgb.DMatrix(X)), atol=1e-5)
+
+
+def test_check_parity_on_saved_model(tmp_path):
+    path = str(tmp_path / "model.json")
+    _train(seed=2).save_model(path)
+
+    result = check_parity(path, rows=200, atol=1e-5)
+    assert result["max_shap_diff"] <= 1e-5
+    assert result["max_prob_diff"] <= 1e-5